@@ -5,6 +5,8 @@ from PIL import Image
 import base64
 from io import BytesIO
 import traceback
+import threading
+from functools import lru_cache
 
 # ==============================
 # CONFIG
@@ -27,15 +29,20 @@ MEAL_THRESHOLDS = {
 HUNGER_THRESHOLD = 4  # Hunger level above this triggers tips
 ENERGY_THRESHOLD = 2  # Energy level below this triggers tips
 
+# Shared session so consecutive requests reuse the same keep-alive/TLS connection
+_session = requests.Session()
+
 # ==============================
 # UTILITIES
 # ==============================
 def check_server_health():
     """Check if the remote LLM server is available"""
     try:
-        response = requests.get(f"{NGROK_URL}/health", timeout=5)
+        response = _session.get(f"{NGROK_URL}/health", timeout=5)
         if response.status_code == 200:
             print("[LLM] SUCCESS: Connected to remote server")
+            if response.json().get("device") == "cpu":
+                print("[LLM] WARNING: Server is running on CPU, responses will be slow")
             return True
         print(f"[LLM] ERROR: Server returned status {response.status_code}")
         return False
@@ -44,8 +51,19 @@ def check_server_health():
         return False
 
 def compress_and_encode_image(image_path, max_size=(512, 512), quality=85):
-    """Compress and encode an image to base64"""
-    img = Image.open(image_path).convert("RGB")
+    """Compress and encode an image to base64 (memoized per file version)"""
+    # Serialized so concurrent requests for the same image wait for one encode
+    with _encode_lock:
+        return _encode_image_cached(image_path, os.path.getmtime(image_path), tuple(max_size), quality)
+
+_encode_lock = threading.Lock()
+
+@lru_cache(maxsize=8)
+def _encode_image_cached(image_path, mtime, max_size, quality):
+    # mtime is part of the key so an overwritten file is re-encoded
+    img = Image.open(image_path)
+    img.draft("RGB", max_size)  # JPEG: decode at reduced scale instead of full resolution
+    img = img.convert("RGB")
     img.thumbnail(max_size)
     buf = BytesIO()
     img.save(buf, format="JPEG", quality=quality)
@@ -62,11 +80,20 @@ def load_model():
     print("[LLM] Make sure remote model program is running and NGROK_URL is correct")
     return None, None
 
-def _make_request(endpoint, payload, timeout=REQUEST_TIMEOUT, operation="Request"):
+# Returned by _make_request(allow_missing=True) and _stream_request when the server
+# has no such endpoint (older server build)
+_UNSUPPORTED = object()
+
+def _make_request(endpoint, payload, timeout=REQUEST_TIMEOUT, operation="Request", allow_missing=False):
     """Unified request handler for all API calls"""
     try:
         print(f"[LLM] Sending {operation.lower()} to remote server...")
-        response = requests.post(f"{NGROK_URL}/{endpoint}", json=payload, timeout=timeout)
+        if isinstance(payload, str):
+            # Body already serialized by the caller
+            response = _session.post(f"{NGROK_URL}/{endpoint}", data=payload.encode('utf-8'),
+                                     headers={"Content-Type": "application/json"}, timeout=timeout)
+        else:
+            response = _session.post(f"{NGROK_URL}/{endpoint}", json=payload, timeout=timeout)
         
         if response.status_code == 200:
             result = response.json()
@@ -74,6 +101,8 @@ def _make_request(endpoint, payload, timeout=REQUEST_TIMEOUT, operation="Request
                 print(f"[LLM ERROR] Server returned error: {result['error']}")
                 return None
             return result
+        if response.status_code == 404 and allow_missing:
+            return _UNSUPPORTED
         
         print(f"[LLM ERROR] Server returned status {response.status_code}")
         print(f"[LLM ERROR] Response: {response.text}")
@@ -88,6 +117,49 @@ def _make_request(endpoint, payload, timeout=REQUEST_TIMEOUT, operation="Request
         traceback.print_exc()
     return None
 
+def _stream_request(endpoint, payload, on_chunk, timeout=REQUEST_TIMEOUT, operation="Request"):
+    """POST payload and read a plain-text streamed reply, passing each piece to on_chunk.
+    Returns the full text, None on failure, or _UNSUPPORTED if the endpoint is missing."""
+    try:
+        print(f"[LLM] Sending {operation.lower()} to remote server (streaming)...")
+        with _session.post(f"{NGROK_URL}/{endpoint}", json=payload, timeout=timeout, stream=True) as response:
+            if response.status_code == 404:
+                return _UNSUPPORTED
+            if response.status_code != 200:
+                print(f"[LLM ERROR] Server returned status {response.status_code}")
+                print(f"[LLM ERROR] Response: {response.text}")
+                return None
+            response.encoding = "utf-8"
+            parts = []
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    parts.append(chunk)
+                    on_chunk(chunk)
+            return "".join(parts).strip()
+    
+    except requests.exceptions.Timeout:
+        print(f"[LLM ERROR] {operation} timed out. Server may be overloaded.")
+    except requests.exceptions.RequestException as e:
+        print(f"[LLM ERROR] {operation} failed: {e}")
+    except Exception as e:
+        print(f"[LLM ERROR] Unexpected error: {e}")
+        traceback.print_exc()
+    return None
+
+def _recipe_request(payload, on_progress=None):
+    """Request a recipe, streaming partial text to on_progress when given.
+    Returns the recipe text or None."""
+    if on_progress is not None:
+        recipe = _stream_request("generate_recipe_stream", payload, on_progress,
+                                 timeout=CHAT_TIMEOUT, operation="Recipe generation")
+        if recipe is not _UNSUPPORTED:
+            return recipe
+        print("[Recipe] Server has no streaming endpoint, waiting for the full recipe")
+    result = _make_request("generate_recipe", payload, timeout=CHAT_TIMEOUT, operation="Recipe generation")
+    if result:
+        return result.get("recipe", "Failed to generate recipe.")
+    return None
+
 # ==============================
 # CORE FUNCTIONS
 # ==============================
@@ -134,6 +206,40 @@ def describe_food(image_path):
         return description
     return None
 
+def analyze_food_image(image_path):
+    """
+    Nutrition estimate and description for one image in a single request.
+    Returns (nutrition, description); falls back to two requests on older servers.
+    """
+    if not os.path.exists(image_path):
+        print(f"[LLM ERROR] Image not found: {image_path}")
+        return None, None
+    
+    try:
+        image_base64 = compress_and_encode_image(image_path)
+    except Exception as e:
+        print(f"[LLM ERROR] Failed to compress/encode image: {e}")
+        return None, None
+    
+    print("[LLM] This may take 10-30 seconds...")
+    result = _make_request("analyze", {"image_base64": image_base64},
+                           operation="Image analysis", allow_missing=True)
+    if result is _UNSUPPORTED:
+        print("[LLM] Server has no analyze endpoint, sending separate requests")
+        return estimate_nutrition(image_path), describe_food(image_path)
+    if not result:
+        return None, None
+    
+    nutrition = result.get("nutrition")
+    if not isinstance(nutrition, dict) or "error" in nutrition:
+        print(f"[LLM ERROR] Nutrition estimation failed: {nutrition}")
+        nutrition = None
+    else:
+        print(f"[LLM] Nutrition estimate: {json.dumps(nutrition, indent=2)}")
+    description = result.get("description")
+    print(f"[LLM] Description: {description}")
+    return nutrition, description
+
 def analyze_meal_context(meal_type, meal_macros, daily_goal_macros, energy_level=None, hunger_level=None):
     """
     Analyze all aspects of a logged meal: macros, hunger, and energy levels.
@@ -250,20 +356,29 @@ def handle_logged_meal(meal_type, meal_macros, daily_goal_macros, energy_level=N
     return get_dynamic_tips(meal_context)
 
 def get_chat_response(user_message, context=None):
-    """Generate a chat response using the remote LLM"""
+    """
+    Generate a chat response using the remote LLM.
+    context may be a dict or an already-serialized JSON object string with the
+    daily_macros/daily_goals/meals_logged fields, which is spliced in as-is.
+    """
     print(f"[CHAT] User asked: {user_message}")
     
-    # Extract all context fields
-    daily_macros = context.get('daily_macros') if context else None
-    daily_goals = context.get('daily_goals') if context else None
-    meals_logged = context.get('meals_logged') if context else None
-    
-    payload = {
-        "message": user_message,
-        "daily_macros": daily_macros,
-        "daily_goals": daily_goals,
-        "meals_logged": meals_logged
-    }
+    if isinstance(context, str) and context.startswith("{") and len(context) > 2:
+        payload = '{"message": ' + json.dumps(user_message) + ', ' + context[1:]
+    else:
+        if isinstance(context, str):
+            context = json.loads(context) if context else None
+        # Extract all context fields
+        daily_macros = context.get('daily_macros') if context else None
+        daily_goals = context.get('daily_goals') if context else None
+        meals_logged = context.get('meals_logged') if context else None
+        
+        payload = {
+            "message": user_message,
+            "daily_macros": daily_macros,
+            "daily_goals": daily_goals,
+            "meals_logged": meals_logged
+        }
     
     result = _make_request("chat", payload, timeout=CHAT_TIMEOUT, operation="Chat")
     if result:
@@ -278,10 +393,11 @@ def get_chat_response(user_message, context=None):
 # Add these to chatbot.py
 # ==============================
 
-def get_recipe_from_text(text_prompt):
+def get_recipe_from_text(text_prompt, on_progress=None):
     """
     Generate a recipe from text description only.
     Double response length for detailed recipe with measurements.
+    on_progress, if given, is called with each piece of text as it streams in.
     """
     print(f"[Recipe] Generating recipe from text: {text_prompt}")
     
@@ -290,19 +406,19 @@ def get_recipe_from_text(text_prompt):
         "mode": "text_only"
     }
     
-    result = _make_request("generate_recipe", payload, timeout=CHAT_TIMEOUT, operation="Recipe generation")
+    recipe = _recipe_request(payload, on_progress)
     
-    if result:
-        recipe = result.get("recipe", "Failed to generate recipe.")
+    if recipe:
         print(f"[Recipe] Generated recipe (text)")
         return recipe
     
     return "Sorry, I couldn't generate a recipe. Please try again."
 
 
-def get_recipe_from_image(image_path):
+def get_recipe_from_image(image_path, on_progress=None):
     """
     Generate a recipe from image of ingredients only.
+    on_progress, if given, is called with each piece of text as it streams in.
     """
     if not os.path.exists(image_path):
         print(f"[Recipe ERROR] Image not found: {image_path}")
@@ -321,20 +437,20 @@ def get_recipe_from_image(image_path):
         "mode": "image_only"
     }
     
-    result = _make_request("generate_recipe", payload, timeout=CHAT_TIMEOUT, operation="Recipe generation")
+    recipe = _recipe_request(payload, on_progress)
     
-    if result:
-        recipe = result.get("recipe", "Failed to generate recipe.")
+    if recipe:
         print(f"[Recipe] Generated recipe (image)")
         return recipe
     
     return "Sorry, I couldn't generate a recipe. Please try again."
 
 
-def get_recipe_from_text_and_image(text_prompt, image_path):
+def get_recipe_from_text_and_image(text_prompt, image_path, on_progress=None):
     """
     Generate a recipe from both text prompt and image of ingredients.
     Text prompt guides the recipe style, image provides available ingredients.
+    on_progress, if given, is called with each piece of text as it streams in.
     """
     if not os.path.exists(image_path):
         print(f"[Recipe ERROR] Image not found: {image_path}")
@@ -355,10 +471,9 @@ def get_recipe_from_text_and_image(text_prompt, image_path):
         "mode": "text_and_image"
     }
     
-    result = _make_request("generate_recipe", payload, timeout=CHAT_TIMEOUT, operation="Recipe generation")
+    recipe = _recipe_request(payload, on_progress)
     
-    if result:
-        recipe = result.get("recipe", "Failed to generate recipe.")
+    if recipe:
         print(f"[Recipe] Generated recipe (text + image)")
         return recipe
     
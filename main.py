@@ -31,8 +31,10 @@ from kivy.uix.popup import Popup
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.textinput import TextInput
 from kivy.uix.image import AsyncImage, Image
+from kivy.uix.camera import Camera
 from kivy.core.image import Image as CoreImage
-from kivy.graphics import Color, Line, RoundedRectangle, Ellipse, Rectangle
+from kivy.graphics import Color, Line, RoundedRectangle, Ellipse, Rectangle, PushMatrix, PopMatrix, Rotate, Translate, InstructionGroup
+from kivy.graphics.texture import Texture
 from kivy.utils import get_color_from_hex
 from kivy.clock import Clock
 from kivy.metrics import dp
@@ -46,11 +48,17 @@ from kivy.app import App
 
 from plyer import filechooser, camera
 import io
-import math, threading, time, traceback, datetime, os, shutil
-from functools import partial
-
-from chatbot import load_model, estimate_nutrition, handle_logged_meal, get_chat_response, describe_food, get_recipe_from_image, get_recipe_from_text, get_recipe_from_text_and_image
-from upload import upload_meal, update_macro_goals, init_firebase, get_user_doc, get_meal_doc
+import logging
+import re
+import requests
+import math, time, traceback, datetime, os, shutil, json
+from functools import partial, lru_cache
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image as PILImage
+
+from chatbot import check_server_health, analyze_food_image, handle_logged_meal, get_chat_response, describe_food, get_recipe_from_image, get_recipe_from_text, get_recipe_from_text_and_image
+from upload import upload_meal, update_macro_goals, init_firebase, get_user_doc, get_meal_doc, get_meal_docs, _today_str
 
 # Mobile Configuration
 if platform == 'android':
@@ -75,15 +83,81 @@ COLORS = {
 }
 Window.clearcolor = COLORS['main']
 
+# Status colors, built once and shared
+_COLOR_ACCENT = tuple(COLORS['accent1'])
+_COLOR_OK = (0.2, 0.8, 0.3, 1)
+_COLOR_ERR = (0.9, 0.3, 0.3, 1)
+_COLOR_OVER = tuple(get_color_from_hex("#8B0000"))
+_COLOR_STATUS_OK = tuple(get_color_from_hex("#B0CA87"))
+_COLOR_STATUS_ERR = tuple(get_color_from_hex("#FF6B6B"))
+
 # insert your user id, project id and firebase url here
 USER_ID = "#USER_ID HERE#"
 PROJECT_ID = "#PROJECT_ID HERE#"
 FIREBASE_URL = f"https://firestore.googleapis.com/v1/projects/{PROJECT_ID}/databases/(default)/documents"
 # Window.size = (360, 640)  # Comment out when compiling to mobile
 
+# Android-only modules and Java classes, resolved once at startup
+if platform == 'android':
+    from jnius import autoclass
+    from android.storage import app_storage_path
+    from android.permissions import request_permissions, check_permission, Permission
+    _PythonActivity = autoclass('org.kivy.android.PythonActivity')
+    _Uri = autoclass('android.net.Uri')
+    _FileInputStream = autoclass('java.io.FileInputStream')
+    _FileOutputStream = autoclass('java.io.FileOutputStream')
+
 # Load KV file
 Builder.load_file('assets/style.kv')
 
+log = logging.getLogger(__name__)
+
+# Full tracebacks only in debug runs; release builds run with -O, where __debug__ is False
+DEBUG = __debug__
+
+# Errors expected from the Firebase fetch/parse path (network failures and malformed documents)
+_FIREBASE_ERRORS = (requests.RequestException, KeyError, ValueError, TypeError, AttributeError)
+
+# Single persistent worker for chat requests (keeps messages in order and
+# reuses the pooled HTTP connection in chatbot.py instead of a thread per send)
+_CHAT_WORKER = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat')
+
+# Shared background workers for Firebase loads, image work and recipe/meal requests
+# (reused instead of a new thread per call; chat has its own worker above)
+_BG = ThreadPoolExecutor(max_workers=3, thread_name_prefix='bg')
+
+# Macro vectors are stored as 4-slot lists in this order (lowercase Firestore keys)
+IDX_CAL, IDX_PROT, IDX_CARB, IDX_FAT = 0, 1, 2, 3
+MACRO_KEYS = ('calories', 'proteins', 'carbs', 'fats')
+# Immutable macro vector for a single meal (same slot order, so IDX_* indexing still works)
+Macros = namedtuple('Macros', MACRO_KEYS)
+DEFAULT_MACRO_GOALS = (2000, 150, 250, 65)
+
+# Words in a food description that mean the photo shows raw ingredients
+_INGREDIENT_RE = re.compile(r'ingredient|vegetable|produce|raw|fresh', re.IGNORECASE)
+
+# Recipe camera: capture resolution and longest side of the saved photo
+RECIPE_CAMERA_RESOLUTION = (1024, 576)
+RECIPE_CAPTURE_MAX_SIDE = 768
+# Refresh the recipe status line every this many streamed text pieces
+RECIPE_PROGRESS_EVERY = 10
+# Longest side of the on-screen preview thumbnail
+PREVIEW_MAX_SIDE = 512
+
+# On-disk snapshot lifetime for the macros header / weekly analytics (seconds)
+DISK_CACHE_TTL = 30 * 60
+# A load_macros refresh younger than this (seconds) is reused instead of hitting Firestore again
+MACROS_REFRESH_TTL = 5.0
+# Age (seconds) under which a cached user document is shown without waiting for Firebase
+USER_DOC_TTL = 60
+
+# A successful model-server check younger than this lets startup skip the blocking check
+SERVER_HEALTH_TTL = 6 * 60 * 60
+
+# In-memory user documents by user id, with fetch timestamps
+_USER_DOC_CACHE = {}
+_USER_DOC_CACHE_TS = {}
+
 # ==============================
 # UTILITY FUNCTIONS
 # ==============================
@@ -100,6 +174,168 @@ def show_popup(title, message, callback=None):
     btn.bind(on_press=lambda x: (popup.dismiss(), callback() if callback else None))
     popup.open()
 
+def _derived_path(path, suffix):
+    """Path for a file derived from path, kept in app storage rather than next to the source"""
+    app = App.get_running_app()
+    base = app.user_data_dir if app else os.path.dirname(os.path.abspath(path))
+    root = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(base, f"{root}{suffix}")
+
+def _fit_rect(img_w, img_h, box_w, box_h, scale=0.9):
+    """
+    Largest (w, h) with the image's aspect ratio that fits scale * box,
+    plus the (x, y) offset that centers it in the box.
+    """
+    img_aspect = img_w / img_h
+    if img_aspect > (box_w / box_h):
+        # Image is wider - fit to width
+        w = box_w * scale
+        h = w / img_aspect
+    else:
+        # Image is taller - fit to height
+        h = box_h * scale
+        w = h * img_aspect
+    return w, h, (box_w - w) / 2, (box_h - h) / 2
+
+def _load_preview_image(path, max_side=PREVIEW_MAX_SIDE):
+    """
+    Decode path into a small RGBA Pillow image for on-screen preview so the
+    full image is never uploaded as a GPU texture.
+    """
+    img = PILImage.open(path)
+    img.draft("RGB", (max_side, max_side))
+    img.thumbnail((max_side, max_side), PILImage.LANCZOS)
+    return img.convert("RGBA")
+
+def _parse_int(text):
+    """int value of numeric text ("12.5" -> 12), or None if empty/invalid"""
+    if not text:
+        return None
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+def _fmt(v):
+    """Whole-number text for a macro value ("123.0" -> "123")"""
+    try:
+        return str(int(float(v or 0)))
+    except (TypeError, ValueError):
+        return str(v)
+
+def _pick(m, keys):
+    """First truthy value of m under any of keys, as int (0 if none)"""
+    for key in keys:
+        value = m.get(key)
+        if value:
+            return int(value)
+    return 0
+
+# Stored-meal key spellings per macro slot: Firestore (lowercase) and nutrition-style
+_MEAL_KEY_ALIASES = (('calories', 'Calories'), ('proteins', 'Protein'),
+                     ('carbs', 'Carbs'), ('fats', 'Fats'))
+
+def _meal_macros(m):
+    """Macros for a stored meal (accepts both lowercase and nutrition-style keys)"""
+    return Macros._make(_pick(m, keys) for keys in _MEAL_KEY_ALIASES)
+
+def _aggregate_days(meal_docs):
+    """
+    Reduce one mealLogs document per day to the analytics series: per-day macro
+    totals plus the integer mean of the energy/hunger survey answers.
+    Works for any number of days, so longer ranges only cost more documents.
+    """
+    data = {k: [] for k in ['calories', 'protein', 'carbs', 'fats', 'energy', 'hunger']}
+    cal, prot, carb, fat = data['calories'], data['protein'], data['carbs'], data['fats']
+    
+    for meal_data in meal_docs:
+        totals = [0, 0, 0, 0]
+        energy_vals, hunger_vals = [], []
+        
+        if meal_data:
+            for meal_type in ('breakfast', 'lunch', 'dinner', 'supper', 'snacks'):
+                m = meal_data.get(meal_type)
+                if not isinstance(m, dict):
+                    continue
+                meal = _meal_macros(m)
+                for i in range(4):
+                    totals[i] += meal[i]
+                if m.get('energy'):
+                    energy_vals.append(int(m['energy']))
+                if m.get('hunger'):
+                    hunger_vals.append(int(m['hunger']))
+        
+        cal.append(totals[IDX_CAL])
+        prot.append(totals[IDX_PROT])
+        carb.append(totals[IDX_CARB])
+        fat.append(totals[IDX_FAT])
+        data['energy'].append(sum(energy_vals) // len(energy_vals) if energy_vals else 0)
+        data['hunger'].append(sum(hunger_vals) // len(hunger_vals) if hunger_vals else 0)
+    
+    return data
+
+def _macros_dict(values):
+    """Capitalized dict view of a macro vector, as expected by chatbot.py"""
+    return {k.capitalize(): v for k, v in zip(MACRO_KEYS, values)}
+
+def _disk_cache_path(name):
+    """JSON cache file under the app's private data dir"""
+    app = App.get_running_app()
+    base = app.user_data_dir if app else os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, f"{name}.json")
+
+def _disk_cache_read(name, ttl=DISK_CACHE_TTL):
+    """Return the cached payload if it exists and is younger than ttl, else None"""
+    path = _disk_cache_path(name)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _disk_cache_write(name, payload):
+    """Atomically replace the cache file with payload"""
+    path = _disk_cache_path(name)
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dict(payload, ts=time.time()), f)
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError) as e:
+        log.warning("disk cache write failed for %s: %s", name, e)
+
+def _disk_cache_drop(name):
+    try:
+        os.remove(_disk_cache_path(name))
+    except OSError:
+        pass
+
+def _macros_cache_key(user_id, date_str):
+    return f"macros_{user_id}_{date_str}"
+
+def _weekly_cache_key(user_id, date_str):
+    """Weekly analytics cache: per user and per day, since the 7-day window moves at midnight"""
+    return f"weekly_{user_id}_{date_str}"
+
+def _cached_user_doc(user_id, ttl=USER_DOC_TTL):
+    """User document from memory, else from disk, if younger than ttl (None otherwise)"""
+    if user_id in _USER_DOC_CACHE and time.time() - _USER_DOC_CACHE_TS[user_id] < ttl:
+        return _USER_DOC_CACHE[user_id]
+    cached = _disk_cache_read(f"user_{user_id}", ttl=ttl)
+    if cached and 'doc' in cached:
+        _USER_DOC_CACHE[user_id] = cached['doc']
+        _USER_DOC_CACHE_TS[user_id] = cached.get('ts', time.time())
+        return cached['doc']
+    return None
+
+def _store_user_doc(user_id, user_doc):
+    """Remember a freshly fetched user document in memory and on disk"""
+    _USER_DOC_CACHE[user_id] = user_doc
+    _USER_DOC_CACHE_TS[user_id] = time.time()
+    _disk_cache_write(f"user_{user_id}", {'doc': user_doc})
+
 # ==============================
 # LOADING SCREEN
 # ==============================
@@ -138,14 +374,72 @@ class ChatBubble(BoxLayout):
 # ==============================
 # PIE CHART
 # ==============================
+Segment = namedtuple('Segment', 'angle color label')
+
+# Donut segment colours
+_PIE_GOAL = (1, 0.9, 0.43, 1)
+_PIE_OVER = (1, 0.42, 0.42, 1)
+_PIE_CONS = (0.31, 0.80, 0.77, 1)
+_PIE_REM = _COLOR_ACCENT
+
+@lru_cache(maxsize=64)
+def _pie_segments(consumed, remaining, calorie_goal):
+    """The two donut segments for a calorie state (shared, immutable)"""
+    if remaining < 0:
+        total = calorie_goal + abs(remaining) or 1
+        return (
+            Segment((calorie_goal / total) * 360, _PIE_GOAL, f'Goal\n{int(calorie_goal)}'),
+            Segment((abs(remaining) / total) * 360, _PIE_OVER, f'Over\n{int(abs(remaining))}'),
+        )
+    total = consumed + remaining or 1
+    return (
+        Segment((consumed / total) * 360, _PIE_CONS, f'Consumed\n{int(consumed)}'),
+        Segment((remaining / total) * 360, _PIE_REM, f'Remaining\n{int(remaining)}'),
+    )
+
 class PieChart(Widget):
+    # Rasterized segment labels shared by all charts: (text, font_size) -> (texture, size), LRU-capped
+    _label_tex_cache = OrderedDict()
+    _LABEL_TEX_CACHE_MAX = 32
+
     def __init__(self, consumed, remaining, calorie_goal, **kwargs):
         super().__init__(**kwargs)
         self.consumed, self.remaining, self.calorie_goal = consumed, remaining, calorie_goal
         self.size_hint = (None, None)
         self._parent_fraction = 0.8
-        self.bind(pos=self.draw_chart, size=self.draw_chart, parent=self._on_parent_set)
-        Clock.schedule_once(self.draw_chart, 0.05)
+        self._last_draw_key = None
+        self._build_instructions()
+        # One redraw per burst of parent resize/move events
+        self._redraw_trigger = Clock.create_trigger(self.draw_chart, 0.05)
+        # First draw comes from _on_parent_set once the chart is sized to its container
+        self.bind(pos=self._redraw_trigger, size=self._redraw_trigger, parent=self._on_parent_set)
+
+    def _build_instructions(self):
+        """Create the donut and label instructions once; draw_chart only updates them.
+        Geometry is in widget-local coordinates behind a Translate, so moving the chart
+        only updates the translation."""
+        self._ig = InstructionGroup()
+        self._seg_colors = [Color(), Color()]
+        self._seg_ellipses = [Ellipse(size=(0, 0)), Ellipse(size=(0, 0))]
+        for color, ellipse in zip(self._seg_colors, self._seg_ellipses):
+            self._ig.add(color)
+            self._ig.add(ellipse)
+        self._hole = Ellipse(size=(0, 0))
+        self._ig.add(Color(*COLORS['accent2']))
+        self._ig.add(self._hole)
+
+        self._label_ig = InstructionGroup()
+        self._label_ig.add(Color(0, 0, 0, 1))
+        self._label_rects = [Rectangle(size=(0, 0)), Rectangle(size=(0, 0))]
+        for rect in self._label_rects:
+            self._label_ig.add(rect)
+
+        self._translate = Translate()
+        self.canvas.add(PushMatrix())
+        self.canvas.add(self._translate)
+        self.canvas.add(self._ig)
+        self.canvas.add(self._label_ig)
+        self.canvas.add(PopMatrix())
 
     def _on_parent_set(self, instance, parent):
         if parent:
@@ -156,65 +450,70 @@ class PieChart(Widget):
         size = min(parent.width, parent.height) * self._parent_fraction
         self.size = (size, size)
         self.center = parent.center
-        Clock.schedule_once(self.draw_chart, 0)
+        self._redraw_trigger()
+
+    def request_redraw(self):
+        """Redraw on the next trigger tick instead of inside the caller's event"""
+        self._redraw_trigger()
 
     def draw_chart(self, *args):
         if self.width <= 0 or self.height <= 0:
             return
-        self.canvas.clear()
-        self.canvas.after.clear()
+        # A move only shifts the already-built drawing
+        self._translate.xy = self.pos
+        # Nothing else that affects the drawing changed since the last draw
+        key = (self.consumed, self.remaining, self.calorie_goal, round(self.width), round(self.height))
+        if key == self._last_draw_key:
+            return
+        self._last_draw_key = key
 
-        # Segments
-        if self.remaining < 0:
-            total = self.calorie_goal + abs(self.remaining) or 1
-            segments = [
-                {'angle': (self.calorie_goal / total) * 360, 'color': (1, 0.9, 0.43, 1), 
-                 'label': f'Goal\n{int(self.calorie_goal)}'},
-                {'angle': (abs(self.remaining) / total) * 360, 'color': (1, 0.42, 0.42, 1), 
-                 'label': f'Over\n{int(abs(self.remaining))}'}
-            ]
-        else:
-            total = self.consumed + self.remaining or 1
-            segments = [
-                {'angle': (self.consumed / total) * 360, 'color': (0.31, 0.80, 0.77, 1), 
-                 'label': f'Consumed\n{int(self.consumed)}'},
-                {'angle': (self.remaining / total) * 360, 'color': COLORS['accent1'], 
-                 'label': f'Remaining\n{int(self.remaining)}'}
-            ]
-
-        cx, cy = self.x + self.width / 2, self.y + self.height / 2
+        segments = _pie_segments(self.consumed, self.remaining, self.calorie_goal)
+
+        cx, cy = self.width / 2, self.height / 2
         outer_radius = min(self.width, self.height) / 2.0
         inner_radius = outer_radius * 0.6
 
-        # Draw donut
+        # Donut (update the existing instructions in place)
         start_angle = 90
-        with self.canvas:
-            for seg in segments:
-                Color(*seg['color'])
-                Ellipse(pos=(cx - outer_radius, cy - outer_radius),
-                       size=(outer_radius * 2, outer_radius * 2),
-                       angle_start=start_angle, angle_end=start_angle + seg['angle'])
-                start_angle += seg['angle']
-            Color(*COLORS['accent2'])
-            Ellipse(pos=(cx - inner_radius, cy - inner_radius),
-                   size=(inner_radius * 2, inner_radius * 2))
+        for seg, color, ellipse in zip(segments, self._seg_colors, self._seg_ellipses):
+            color.rgba = seg.color
+            ellipse.pos = (cx - outer_radius, cy - outer_radius)
+            ellipse.size = (outer_radius * 2, outer_radius * 2)
+            ellipse.angle_start = start_angle
+            ellipse.angle_end = start_angle + seg.angle
+            start_angle += seg.angle
+        self._hole.pos = (cx - inner_radius, cy - inner_radius)
+        self._hole.size = (inner_radius * 2, inner_radius * 2)
 
         # Labels
         start_angle = 90
-        for seg in segments:
-            mid_angle = start_angle + seg['angle'] / 2
-            label_distance = outer_radius * 0.85
-            label_x = cx + label_distance * math.cos(math.radians(mid_angle))
-            label_y = cy + label_distance * math.sin(math.radians(mid_angle))
-            text_label = CoreLabel(text=seg['label'], font_size=dp(10), bold=True, 
-                                  halign='center', valign='middle')
-            text_label.refresh()
-            with self.canvas.after:
-                Color(0, 0, 0, 1)
-                Rectangle(texture=text_label.texture,
-                         pos=(label_x - text_label.width / 2, label_y - text_label.height / 2),
-                         size=text_label.size)
-            start_angle += seg['angle']
+        label_distance = outer_radius * 0.85
+        for seg, rect in zip(segments, self._label_rects):
+            mid_rad = math.radians(start_angle + seg.angle / 2)
+            label_x = cx + label_distance * math.cos(mid_rad)
+            label_y = cy + label_distance * math.sin(mid_rad)
+            texture, tex_size = self._label_texture(seg.label, dp(10))
+            rect.texture = texture
+            rect.pos = (label_x - tex_size[0] / 2, label_y - tex_size[1] / 2)
+            rect.size = tex_size
+            start_angle += seg.angle
+
+    @classmethod
+    def _label_texture(cls, text, font_size):
+        """Label texture for text, rendered once and reused across redraws"""
+        key = (text, font_size)
+        cache = cls._label_tex_cache
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        text_label = CoreLabel(text=text, font_size=font_size, bold=True,
+                               halign='center', valign='middle')
+        text_label.refresh()
+        hit = cache[key] = (text_label.texture, tuple(text_label.size))
+        if len(cache) > cls._LABEL_TEX_CACHE_MAX:
+            cache.popitem(last=False)
+        return hit
 
 # ==============================
 # LINE GRAPH
@@ -342,6 +641,10 @@ class LineGraph(FloatLayout):
 class MacrosHeader(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self._pie = None
+        # Latest bar values; applied once per frame however many set_data calls land
+        self._pending_bars = None
+        self._bars_trigger = Clock.create_trigger(self._flush_bars, 0)
         self.calorie_goal = 2000
         self.protein_goal = 150
         self.carbs_goal = 250
@@ -358,40 +661,63 @@ class MacrosHeader(BoxLayout):
         bar_widget.ids.value_label.text = f"{int(current)}/{int(goal)}g"
         
         is_over = current > goal
-        bar_widget.ids.value_label.color = get_color_from_hex("#8B0000") if is_over else COLORS['main']
-        color = "#8B0000" if is_over else bar_widget.bar_color
+        bar_widget.ids.value_label.color = _COLOR_OVER if is_over else COLORS['main']
 
         bar = bar_widget.ids.bar
+        if getattr(bar, 'rect', None) is None:
+            self._create_bar(bar, bar_widget.bar_color)
+        bar.pct = pct
+        bar._color_instr.rgba = _COLOR_OVER if is_over else bar._rgba
+        bar.rect.pos = bar.pos
+        bar.rect.size = (bar.parent.width * (pct / 100), bar.height)
+
+    def _create_bar(self, bar, color_hex):
+        """Create the fill instructions once and follow the track's size with a single binding"""
+        bar._rgba = tuple(get_color_from_hex(color_hex))
+        bar.canvas.before.clear()
         with bar.canvas.before:
-            bar.canvas.before.clear()
-            Color(*get_color_from_hex(color))
-            bar.rect = RoundedRectangle(radius=[dp(3)], pos=bar.pos, 
-                                       size=(bar.parent.width * (pct / 100), bar.height))
+            bar._color_instr = Color()
+            bar.rect = RoundedRectangle(radius=[dp(3)], pos=bar.pos, size=(0, bar.height))
+        bar.pct = 0
+        bar.parent.bind(pos=partial(self._layout_bar, bar), size=partial(self._layout_bar, bar))
 
-        def update_size(o, v):
-            bar.rect.pos = o.pos
-            bar.rect.size = (o.width * (pct / 100), o.height)
-        bar.parent.unbind(pos=update_size, size=update_size)
-        bar.parent.bind(pos=update_size, size=update_size)
+    @staticmethod
+    def _layout_bar(bar, track, _):
+        bar.rect.pos = track.pos
+        bar.rect.size = (track.width * (bar.pct / 100), track.height)
 
     def set_data(self, consumed, goals=None):
+        """consumed/goals are 4-slot sequences indexed by IDX_CAL/IDX_PROT/IDX_CARB/IDX_FAT"""
         if goals:
-            self.calorie_goal = goals.get('calories', 2000)
-            self.protein_goal = goals.get('proteins', 150)
-            self.carbs_goal = goals.get('carbs', 250)
-            self.fats_goal = goals.get('fats', 65)
+            self.calorie_goal = goals[IDX_CAL]
+            self.protein_goal = goals[IDX_PROT]
+            self.carbs_goal = goals[IDX_CARB]
+            self.fats_goal = goals[IDX_FAT]
 
-        cal_consumed = consumed.get('calories', 0)
+        cal_consumed = consumed[IDX_CAL]
         cal_remaining = self.calorie_goal - cal_consumed
 
-        self.ids.pie_container.clear_widgets()
-        self.ids.pie_container.add_widget(PieChart(cal_consumed, cal_remaining, self.calorie_goal))
-        Clock.schedule_once(lambda dt: self.ids.pie_container.children[0].draw_chart() 
-                          if self.ids.pie_container.children else None, 0.1)
+        # Reuse the chart; its dirty check makes unchanged updates free
+        if self._pie is None:
+            self._pie = PieChart(cal_consumed, cal_remaining, self.calorie_goal)
+            self.ids.pie_container.add_widget(self._pie)
+        else:
+            self._pie.consumed, self._pie.remaining, self._pie.calorie_goal = cal_consumed, cal_remaining, self.calorie_goal
+            self._pie.request_redraw()
+
+        self._pending_bars = ((consumed[IDX_PROT], self.protein_goal),
+                              (consumed[IDX_CARB], self.carbs_goal),
+                              (consumed[IDX_FAT], self.fats_goal))
+        self._bars_trigger()
 
-        self._update_bar(self.ids.protein_bar, consumed.get('proteins', 0), self.protein_goal)
-        self._update_bar(self.ids.carbs_bar, consumed.get('carbs', 0), self.carbs_goal)
-        self._update_bar(self.ids.fats_bar, consumed.get('fats', 0), self.fats_goal)
+    def _flush_bars(self, dt):
+        if self._pending_bars is None:
+            return
+        (prot, prot_goal), (carb, carb_goal), (fat, fat_goal) = self._pending_bars
+        self._pending_bars = None
+        self._update_bar(self.ids.protein_bar, prot, prot_goal)
+        self._update_bar(self.ids.carbs_bar, carb, carb_goal)
+        self._update_bar(self.ids.fats_bar, fat, fat_goal)
     
     def show_analytics_popup(self, instance):
         chat_screen = self._find_parent(ChatScreen)
@@ -405,7 +731,7 @@ class MacrosHeader(BoxLayout):
                 weekly_data = chat_screen.load_weekly_analytics()
                 loading.dismiss()
                 Clock.schedule_once(lambda dt: AnalyticsPopup(weekly_data).open(), 0)
-            threading.Thread(target=fetch, daemon=True).start()
+            _BG.submit(fetch)
         else:
             AnalyticsPopup().open()
     
@@ -539,11 +865,13 @@ class ChatScreen(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.current_meal_type = "breakfast"
+        self._macros_fetched_at = 0.0
         # Bind after widget is fully constructed
         Clock.schedule_once(self._setup_bindings, 0)
-        Clock.schedule_once(lambda dt: self.load_macros(), 1.0)
         Clock.schedule_once(lambda dt: self.add_message(
             "Welcome to Diet Tracker!\nTap 'Log Meal' to record your meals.", False), 0.5)
+        # Start fetching right away; results reach the header via Clock on the UI thread
+        self.load_macros()
     
     def _setup_bindings(self, dt):
         """Setup bindings after widget is ready"""
@@ -556,92 +884,169 @@ class ChatScreen(BoxLayout):
         self.ids.chat_input.text = ""
         self.add_message(msg, True)
         self.add_message("Thinking...", False)
-        threading.Thread(target=self._process_chat, args=(msg,), daemon=True).start()
+        _CHAT_WORKER.submit(self._process_chat, msg)
     
     def _process_chat(self, msg):
         try:
-            context = {
-                'daily_macros': self.total_daily_macros,
-                'daily_goals': self.daily_goal_macros,
-                'meals_logged': getattr(self, 'meals_logged_today', []),
-                'user_id': USER_ID
-            } if hasattr(self, 'total_daily_macros') else None
+            context = None
+            if hasattr(self, 'total_daily_macros'):
+                # Re-serialize only when the macros state changed since the last send
+                if getattr(self, '_context_dirty', True):
+                    # Cleared first: a macros update landing while this serializes re-marks it
+                    self._context_dirty = False
+                    self._context_json = json.dumps(self._build_context())
+                context = self._context_json
             
             response = get_chat_response(msg, context)
             Clock.schedule_once(lambda dt: self.remove_last_message(), 0)
             Clock.schedule_once(lambda dt: self.add_message(response, False), 0)
         except Exception as e:
-            traceback.print_exc()
+            if DEBUG:
+                traceback.print_exc()
             Clock.schedule_once(lambda dt: self.remove_last_message(), 0)
             Clock.schedule_once(lambda dt: self.add_message(
                 "Sorry, I couldn't process that. Please try again.", False), 0)
     
-    def load_macros(self):
+    def _build_context(self):
+        # Snapshot the lists: other threads replace or update them in place
+        return {
+            'daily_macros': _macros_dict(tuple(self.total_daily_macros)),
+            'daily_goals': _macros_dict(tuple(self.daily_goal_macros)),
+            'meals_logged': list(getattr(self, 'meals_logged_today', [])),
+            'user_id': USER_ID
+        }
+    
+    def load_macros(self, force=False):
+        """Load today's totals and goals (skipped if refreshed within MACROS_REFRESH_TTL unless force)"""
+        if not force and time.monotonic() - self._macros_fetched_at < MACROS_REFRESH_TTL:
+            return
+        
         def load():
+            today = _today_str()
+            cache_key = _macros_cache_key(USER_ID, today)
+            cached = _disk_cache_read(cache_key)
+            if cached:
+                # Paint the last known totals straight away; Firestore refresh follows
+                self.total_daily_macros = list(cached['consumed'])
+                self.daily_goal_macros = list(cached['daily_goal'])
+                self.meals_logged_today = list(cached.get('meals_logged_today', []))
+                self.logged_meal_macros = dict(cached.get('logged_meal_macros', {}))
+                self._context_dirty = True
+                Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(
+                    self.total_daily_macros, self.daily_goal_macros), 0)
+            
             try:
                 db = init_firebase()
                 if db is None:
-                    Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(
-                        {'calories': 0, 'proteins': 0, 'carbs': 0, 'fats': 0},
-                        {'calories': 2000, 'proteins': 150, 'carbs': 250, 'fats': 65}), 0)
+                    if not cached:
+                        Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(
+                            [0, 0, 0, 0], DEFAULT_MACRO_GOALS), 0)
                     return
                 
                 use_rest = isinstance(db, bool)
-                today = datetime.date.today().strftime("%Y-%m-%d")
                 
                 if use_rest:
                     user_doc = get_user_doc(USER_ID)
                     meal_data = get_meal_doc(USER_ID, today) or {}
+                    if user_doc is not None:
+                        _store_user_doc(USER_ID, user_doc)
                 else:
                     user_ref = db.collection('users').document(USER_ID)
-                    user_doc = user_ref.get().to_dict() if user_ref.get().exists else None
-                    meal_ref = db.collection('users').document(USER_ID).collection('mealLogs').document(today)
-                    meal_data = meal_ref.get().to_dict() if meal_ref.get().exists else {}
-                
-                daily_goal = user_doc.get('daily_macros_goal', 
-                    {'calories': 2000, 'proteins': 150, 'carbs': 250, 'fats': 65}) \
-                    if user_doc else {'calories': 2000, 'proteins': 150, 'carbs': 250, 'fats': 65}
+                    user_snap = user_ref.get()
+                    user_doc = user_snap.to_dict() if user_snap.exists else None
+                    meal_snap = user_ref.collection('mealLogs').document(today).get()
+                    meal_data = meal_snap.to_dict() if meal_snap.exists else {}
                 
-                consumed = {'calories': 0, 'proteins': 0, 'carbs': 0, 'fats': 0}
+                if user_doc is None and cached:
+                    # Fetch failed (offline) - keep showing the disk snapshot
+                    return
                 
-                if meal_data:
-                    if 'macros_left' in meal_data and isinstance(meal_data['macros_left'], dict):
-                        ml = meal_data['macros_left']
-                        for key in consumed:
-                            consumed[key] = daily_goal.get(key, 0) - ml.get(key, 0)
-                    else:
-                        for meal_type in ['breakfast', 'lunch', 'dinner', 'supper', 'snacks']:
-                            if meal_type in meal_data and isinstance(meal_data[meal_type], dict):
-                                m = meal_data[meal_type]
-                                consumed['calories'] += int(m.get('calories') or m.get('Calories') or 0)
-                                consumed['proteins'] += int(m.get('proteins') or m.get('Protein') or 0)
-                                consumed['carbs'] += int(m.get('carbs') or m.get('Carbs') or 0)
-                                consumed['fats'] += int(m.get('fats') or m.get('Fats') or 0)
+                goal_doc = (user_doc or {}).get('daily_macros_goal') or {}
+                daily_goal = [goal_doc.get(k, d) for k, d in zip(MACRO_KEYS, DEFAULT_MACRO_GOALS)]
+                cal = prot = carb = fat = 0
                 
                 self.meals_logged_today = []
+                self.logged_meal_macros = {}
                 if meal_data:
                     for meal_type in ['breakfast', 'lunch', 'dinner', 'supper', 'snacks']:
-                        if meal_type in meal_data and isinstance(meal_data[meal_type], dict):
-                            m = meal_data[meal_type]
+                        entry = meal_data.get(meal_type)
+                        if isinstance(entry, dict):
+                            meal = _meal_macros(entry)
                             # Check if meal has actual data
-                            if m.get('calories') or m.get('Calories'):
+                            if meal.calories:
                                 self.meals_logged_today.append(meal_type)
+                            self.logged_meal_macros[meal_type] = meal
+                            cal += meal.calories
+                            prot += meal.proteins
+                            carb += meal.carbs
+                            fat += meal.fats
+                consumed = [cal, prot, carb, fat]
                 
-                self.total_daily_macros = {k.capitalize(): v for k, v in consumed.items()}
-                self.daily_goal_macros = {k.capitalize(): v for k, v in daily_goal.items()}
+                ml = meal_data.get('macros_left') if meal_data else None
+                if isinstance(ml, dict):
+                    consumed = [goal - ml.get(key, 0) for goal, key in zip(daily_goal, MACRO_KEYS)]
+                
+                self.total_daily_macros = consumed
+                self.daily_goal_macros = daily_goal
+                self._context_dirty = True
+                self._macros_fetched_at = time.monotonic()
                 
                 Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(consumed, daily_goal), 0)
+                self._save_macros_cache(today)
 
-            except:
-                traceback.print_exc()
-                Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(
-                    {'calories': 0, 'proteins': 0, 'carbs': 0, 'fats': 0},
-                    {'calories': 2000, 'proteins': 150, 'carbs': 250, 'fats': 65}), 0)
+            except _FIREBASE_ERRORS as e:
+                log.warning("load_macros failed: %s", e)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("load_macros traceback", exc_info=True)
+                if not cached:
+                    Clock.schedule_once(lambda dt: self.ids.macros_header.set_data(
+                        [0, 0, 0, 0], DEFAULT_MACRO_GOALS), 0)
         
-        threading.Thread(target=load, daemon=True).start()
+        _BG.submit(load)
+    
+    def apply_meal_delta(self, meal_type, meal_macros):
+        """
+        Fold a just-written meal into today's totals without re-reading Firestore.
+        The client already knows what it wrote, so only the difference against the
+        previous entry for this meal type (if any) is applied to the header.
+        meal_macros is indexed by IDX_CAL/IDX_PROT/IDX_CARB/IDX_FAT.
+        """
+        if not hasattr(self, 'total_daily_macros'):
+            # Nothing loaded yet to apply a delta to
+            self.load_macros()
+            return
+        
+        previous = self.logged_meal_macros.get(meal_type, (0, 0, 0, 0))
+        for i in range(4):
+            self.total_daily_macros[i] += meal_macros[i] - previous[i]
+        self.logged_meal_macros[meal_type] = list(meal_macros)
+        if meal_type not in self.meals_logged_today and meal_macros[IDX_CAL]:
+            self.meals_logged_today.append(meal_type)
+        self._context_dirty = True
+        
+        self.ids.macros_header.set_data(self.total_daily_macros, self.daily_goal_macros)
+        
+        today = _today_str()
+        self._save_macros_cache(today)
+        _disk_cache_drop(_weekly_cache_key(USER_ID, today))
+    
+    def _save_macros_cache(self, date_str):
+        """Persist today's header state so the next cold start can paint it from disk"""
+        _disk_cache_write(_macros_cache_key(USER_ID, date_str), {
+            'consumed': self.total_daily_macros,
+            'daily_goal': self.daily_goal_macros,
+            'meals_logged_today': self.meals_logged_today,
+            'logged_meal_macros': self.logged_meal_macros,
+        })
     
     def load_weekly_analytics(self):
-        """Fetch 7 days of meal data"""
+        """Fetch 7 days of meal data (served from the disk cache while it is fresh)"""
+        cache_key = _weekly_cache_key(USER_ID, _today_str())
+        cached = _disk_cache_read(cache_key)
+        if cached:
+            cached.pop('ts', None)
+            return cached
+        
         try:
             db = init_firebase()
             if db is None:
@@ -649,39 +1054,26 @@ class ChatScreen(BoxLayout):
             
             use_rest = isinstance(db, bool)
             today = datetime.date.today()
-            data = {k: [] for k in ['calories', 'protein', 'carbs', 'fats', 'energy', 'hunger']}
-            
-            for i in range(6, -1, -1):
-                date_str = (today - datetime.timedelta(days=i)).strftime("%Y-%m-%d")
-                meal_data = get_meal_doc(USER_ID, date_str) if use_rest else \
-                    (lambda ref: ref.get().to_dict() if ref.get().exists else {})(
-                        db.collection('users').document(USER_ID).collection('mealLogs').document(date_str))
-                
-                day_totals = {'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0}
-                energy_vals, hunger_vals = [], []
-                
-                if meal_data:
-                    for meal_type in ['breakfast', 'lunch', 'dinner', 'supper', 'snacks']:
-                        if meal_type in meal_data and isinstance(meal_data[meal_type], dict):
-                            m = meal_data[meal_type]
-                            day_totals['calories'] += int(m.get('calories') or m.get('Calories') or 0)
-                            day_totals['protein'] += int(m.get('proteins') or m.get('Protein') or 0)
-                            day_totals['carbs'] += int(m.get('carbs') or m.get('Carbs') or 0)
-                            day_totals['fats'] += int(m.get('fats') or m.get('Fats') or 0)
-                            if 'energy' in m and m['energy']:
-                                energy_vals.append(int(m['energy']))
-                            if 'hunger' in m and m['hunger']:
-                                hunger_vals.append(int(m['hunger']))
-                
-                for key in day_totals:
-                    data[key].append(day_totals[key])
-                data['energy'].append(sum(energy_vals) // len(energy_vals) if energy_vals else 0)
-                data['hunger'].append(sum(hunger_vals) // len(hunger_vals) if hunger_vals else 0)
+            dates = [(today - datetime.timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6, -1, -1)]
+            if use_rest:
+                meal_docs = get_meal_docs(USER_ID, dates)
+            else:
+                meal_docs = [(lambda ref: ref.get().to_dict() if ref.get().exists else {})(
+                                 db.collection('users').document(USER_ID).collection('mealLogs').document(date_str))
+                             for date_str in dates]
+            data = _aggregate_days(meal_docs)
             
+            _disk_cache_write(cache_key, data)
             return data
-        except:
-            traceback.print_exc()
-            return None
+        except _FIREBASE_ERRORS as e:
+            log.warning("load_weekly_analytics failed: %s", e)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("load_weekly_analytics traceback", exc_info=True)
+            # Offline: fall back to today's last computed week regardless of age
+            stale = _disk_cache_read(cache_key, ttl=float('inf'))
+            if stale:
+                stale.pop('ts', None)
+            return stale
 
     def add_message(self, msg, is_user=False):
         self.ids.chat_history.add_widget(ChatBubble(msg, is_user=is_user))
@@ -726,6 +1118,12 @@ class NavigationPopup(Popup):
 # ==============================
 # MEAL LOGGING SCREEN
 # ==============================
+# Meal-type button colors (selected / unselected)
+_MEAL_SEL_BG = get_color_from_hex("#B0CA87")
+_MEAL_SEL_FG = get_color_from_hex("#1E2D2F")
+_MEAL_UNSEL_BG = get_color_from_hex("#4A5A4B")
+_MEAL_UNSEL_FG = get_color_from_hex("#BFD1E5")
+
 class MealLoggingScreen(BoxLayout):
     def __init__(self, chat_screen, **kwargs):
         super().__init__(**kwargs)
@@ -733,6 +1131,21 @@ class MealLoggingScreen(BoxLayout):
         self.selected_image = None
         self.food_description = ""
         self._logging_in_progress = False
+        self._last_calories_text = None
+        self._preview_texture = None
+        self._meal_buttons = None
+        self._analysis_token = 0
+        # Storage dir for captured/copied images (resolved once; a JNI call on Android)
+        self._temp_dir = app_storage_path() if platform == 'android' else os.path.expanduser("~")
+        self._pending_form = None
+        self._update_form_trigger = Clock.create_trigger(self._apply_form, 0)
+        # Keyboard animation gate: set on keyboard_height changes, cleared 50 ms after the last one
+        self._kb_animating = False
+        self._kb_settle_trigger = Clock.create_trigger(self._on_kb_settled, 0.05)
+        Window.bind(keyboard_height=self._on_keyboard_height)
+        self._camera_transform_trigger = Clock.create_trigger(self._update_camera_transform, -1)
+        # Coalesces bursts of keystrokes into one validation pass (trailing edge)
+        self._validate_trigger = Clock.create_trigger(self._do_validate, 0.12)
         
         # Set initial meal type after widget is ready
         Clock.schedule_once(lambda dt: self.set_meal_type(chat_screen.current_meal_type), 0)
@@ -746,57 +1159,71 @@ class MealLoggingScreen(BoxLayout):
         """Set the selected meal type and update button states"""
         self.selected_meal_type = meal_type.lower()
         
-        # Update button colors
-        meal_buttons = {
-            'breakfast': self.ids.breakfast_btn,
-            'lunch': self.ids.lunch_btn,
-            'dinner': self.ids.dinner_btn,
-            'supper': self.ids.supper_btn,
-            'snacks': self.ids.snacks_btn
-        }
+        if self._meal_buttons is None:
+            ids = self.ids
+            self._meal_buttons = (
+                ('breakfast', ids.breakfast_btn),
+                ('lunch', ids.lunch_btn),
+                ('dinner', ids.dinner_btn),
+                ('supper', ids.supper_btn),
+                ('snacks', ids.snacks_btn),
+            )
         
-        for meal, button in meal_buttons.items():
+        # Update button colors
+        for meal, button in self._meal_buttons:
             if meal == self.selected_meal_type:
                 # Selected state - bright green
-                button.bg_color = get_color_from_hex("#B0CA87")
-                button.color = get_color_from_hex("#1E2D2F")
+                button.bg_color = _MEAL_SEL_BG
+                button.color = _MEAL_SEL_FG
             else:
                 # Unselected state - darker
-                button.bg_color = get_color_from_hex("#4A5A4B")
-                button.color = get_color_from_hex("#BFD1E5")
+                button.bg_color = _MEAL_UNSEL_BG
+                button.color = _MEAL_UNSEL_FG
     
     def _setup_validation(self, dt):
         """Setup validation for nutrition inputs"""
+        # Cache widget references once instead of walking ids on every keystroke
+        ids = self.ids
+        self._cal_in = ids.calories_input.ids.input_field
+        self._prot_in = ids.proteins_input.ids.input_field
+        self._carb_in = ids.carbs_input.ids.input_field
+        self._fat_in = ids.fats_input.ids.input_field
+        self._macro_inputs = (self._cal_in, self._prot_in, self._carb_in, self._fat_in)
+        self._desc_in = ids.description_input.ids.text_input if 'description_input' in ids else None
+        self._log_btn = ids.log_btn
+        self._status_label = ids.status_label
+        
         # Start with button disabled
-        self.ids.log_btn.disabled = True
+        self._log_btn.disabled = True
         
         # Bind all inputs to validation using text property (NOT on_text_validate)
-        for input_id in ['calories_input', 'proteins_input', 'carbs_input', 'fats_input']:
-            input_field = self.ids[input_id].ids.input_field
-            # Use text binding - works reliably on Android
-            input_field.bind(text=lambda instance, value: self._validate_form(instance, value))
+        for input_field in self._macro_inputs:
+            # Use text binding - works reliably on Android (fbind: no per-field closure)
+            input_field.fbind('text', self._validate_form)
 
     def _validate_form(self, instance=None, value=None):
         """Enable log button if at least calories is filled"""
-        # Defer validation to avoid focus conflicts
-        Clock.schedule_once(self._do_validate, 0)
+        # Defer (and debounce) validation to avoid focus conflicts
+        self._validate_trigger()
 
     def _do_validate(self, dt):
         """Actual validation logic - deferred to avoid focus conflicts"""
         try:
-            calories_text = self.ids.calories_input.ids.input_field.text.strip()
-            should_enable = bool(calories_text)
+            calories_text = self._cal_in.text.strip()
+            if calories_text == self._last_calories_text:
+                return
+            self._last_calories_text = calories_text
+            disabled = 1 ^ bool(calories_text)
             
             # Only update if the state actually changed
-            if self.ids.log_btn.disabled != (not should_enable):
-                self.ids.log_btn.disabled = not should_enable
+            if disabled ^ self._log_btn.disabled:
+                self._log_btn.disabled = bool(disabled)
         except Exception as e:
             print(f"Validation error: {e}")
     
     def _request_permissions(self):
         if platform == 'android':
             try:
-                from android.permissions import request_permissions, Permission
                 request_permissions([
                     Permission.READ_EXTERNAL_STORAGE, 
                     Permission.WRITE_EXTERNAL_STORAGE,
@@ -806,6 +1233,9 @@ class MealLoggingScreen(BoxLayout):
                 pass
     
     def go_back(self, instance):
+        # A new screen is built on every visit; stop this one reacting to the keyboard
+        Window.unbind(keyboard_height=self._on_keyboard_height)
+        self._kb_settle_trigger.cancel()
         App.get_running_app().root.clear_widgets()
         App.get_running_app().root.add_widget(self.chat_screen)
 
@@ -829,8 +1259,6 @@ class MealLoggingScreen(BoxLayout):
         """
         try:
             if platform == 'android':
-                from android.permissions import request_permissions, Permission, check_permission
-                
                 # Check if permission is already granted
                 if not check_permission(Permission.CAMERA):
                     # Request permission with callback
@@ -864,54 +1292,34 @@ class MealLoggingScreen(BoxLayout):
 
     def _open_camera_widget(self):
         """Open camera using Kivy Camera widget"""
-        from kivy.uix.camera import Camera
-        from kivy.uix.button import Button
-        from kivy.uix.boxlayout import BoxLayout
-        from kivy.uix.floatlayout import FloatLayout
-        from kivy.uix.popup import Popup
-        from kivy.graphics import PushMatrix, PopMatrix, Rotate
-        
         # Use FloatLayout for absolute positioning control
         camera_container = FloatLayout()
         
-        # Create camera widget - force it to fill the container
+        # Create camera widget - force it to fill the container.
+        # Its own (unrotated) draw is made transparent; the frame is drawn by the
+        # rectangle below with rotated texture coordinates instead of a Rotate matrix.
         camera_widget = Camera(
             play=True, 
             resolution=(1280, 720), 
             index=0,
             size_hint=(None, None),  # Disable size hints for manual control
-            allow_stretch=True
+            allow_stretch=True,
+            color=(1, 1, 1, 0)
         )
         
-        # Store rotation instruction
-        rotation = Rotate(angle=270, origin=(0, 0))
-        
-        # Add rotation to camera
-        with camera_widget.canvas.before:
-            PushMatrix()
-            camera_widget.canvas.before.add(rotation)
         with camera_widget.canvas.after:
-            PopMatrix()
+            Color(1, 1, 1, 1)
+            camera_rect = Rectangle()
         
-        def update_camera_transform(instance, value):
-            """Update camera size and rotation to fill the container"""
-            # Get container size (accounting for buttons at bottom)
-            container_width = camera_container.width
-            container_height = camera_container.height - 50  # Subtract button height
-            
-            # After 270° rotation, width becomes height and vice versa
-            # So we need to swap dimensions for the camera widget
-            camera_widget.width = container_height  # Will become height after rotation
-            camera_widget.height = container_width  # Will become width after rotation
-            
-            # Position at center before rotation
-            camera_widget.x = camera_container.x + (container_width - camera_widget.width) / 2
-            camera_widget.y = camera_container.y + 50 + (container_height - camera_widget.height) / 2
-            
-            # Update rotation origin to camera center
-            rotation.origin = (camera_widget.center_x, camera_widget.center_y)
+        self._camera_container = camera_container
+        self._camera_widget = camera_widget
+        self._camera_rect = camera_rect
+        camera_widget.fbind('texture', self._on_camera_texture)
+        self._on_camera_texture(camera_widget, camera_widget.texture)
         
-        camera_container.bind(pos=update_camera_transform, size=update_camera_transform)
+        # Collapse bursts of pos/size events (layout, keyboard animation) into one update per frame
+        camera_container.fbind('pos', self._camera_transform_trigger)
+        camera_container.fbind('size', self._camera_transform_trigger)
         
         # Add camera to container
         camera_container.add_widget(camera_widget)
@@ -932,7 +1340,7 @@ class MealLoggingScreen(BoxLayout):
         # Create capture button
         capture_btn = Button(
             text='Capture Photo',
-            background_color=COLORS['accent1']
+            background_color=_COLOR_ACCENT
         )
         
         button_layout.add_widget(cancel_btn)
@@ -952,14 +1360,7 @@ class MealLoggingScreen(BoxLayout):
         def capture_photo(instance):
             """Capture and save the photo"""
             try:
-                if platform == 'android':
-                    from android.storage import app_storage_path
-                    temp_dir = app_storage_path()
-                else:
-                    temp_dir = os.path.expanduser("~")
-                
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                filepath = os.path.join(temp_dir, f"camera_photo_{timestamp}.png")
+                filepath = os.path.join(self._temp_dir, f"camera_photo_{int(time.time() * 1000)}.png")
                 
                 # Export camera texture to file
                 camera_widget.export_to_png(filepath)
@@ -992,7 +1393,36 @@ class MealLoggingScreen(BoxLayout):
         camera_popup.open()
         
         # Force initial update
-        Clock.schedule_once(lambda dt: update_camera_transform(camera_container, None), 0.1)
+        Clock.schedule_once(self._update_camera_transform, 0.1)
+
+    def _on_camera_texture(self, camera_widget, texture):
+        """Point the preview rectangle at the camera texture, rotated 270° via UVs"""
+        if texture is None:
+            return
+        tc = texture.tex_coords
+        self._camera_rect.texture = texture
+        # Corners are (bl, br, tr, tl); shifting by two corners rotates the image a quarter turn
+        self._camera_rect.tex_coords = tc[2:] + tc[:2]
+        self._camera_transform_trigger()
+
+    def _update_camera_transform(self, *args):
+        """Update camera size and preview rectangle to fill the container"""
+        camera_container = self._camera_container
+        camera_widget = self._camera_widget
+        
+        # Get container size (accounting for buttons at bottom)
+        container_width = camera_container.width
+        container_height = camera_container.height - 50  # Subtract button height
+        
+        camera_widget.size = (container_width, container_height)
+        camera_widget.pos = (camera_container.x, camera_container.y + 50)
+        
+        # Rotated frame is portrait: swap the texture's width/height when fitting
+        texture = camera_widget.texture
+        tex_w, tex_h = (texture.height, texture.width) if texture else (container_width, container_height)
+        w, h, x, y = _fit_rect(tex_w, tex_h, container_width, container_height, scale=1.0)
+        self._camera_rect.size = (w, h)
+        self._camera_rect.pos = (camera_widget.x + x, camera_widget.y + y)
 
     def _process_camera_photo(self, filepath):
         """Process captured photo - runs on main Kivy thread"""
@@ -1005,39 +1435,8 @@ class MealLoggingScreen(BoxLayout):
             self.selected_image = filepath
             print("Photo saved to:", filepath)
             
-            # Display preview
-            self.ids.img_placeholder.opacity = 0
-            self.ids.img_preview.source = filepath
-            self.ids.img_preview.reload()
-            
-            # Load the image to get its actual dimensions
-            from kivy.core.image import Image as CoreImage
-            img = CoreImage(filepath)
-            img_width, img_height = img.texture.size
-            img_aspect = img_width / img_height
-            
-            # Get the container (FloatLayout) size
-            container = self.ids.img_preview.parent
-            container_width = container.width
-            container_height = container.height
-            
-            # Calculate size that fits entirely in container
-            if img_aspect > (container_width / container_height):
-                # Image is wider - fit to width
-                preview_width = container_width * 0.9
-                preview_height = preview_width / img_aspect
-            else:
-                # Image is taller - fit to height
-                preview_height = container_height * 0.9
-                preview_width = preview_height * img_aspect
-            
-            # Set size and manually center it
-            self.ids.img_preview.size = (preview_width, preview_height)
-            self.ids.img_preview.pos = (
-                container.x + (container_width - preview_width) / 2,
-                container.y + (container_height - preview_height) / 2
-            )
-            self.ids.img_preview.opacity = 1
+            # Display preview (from a small thumbnail, not the full capture)
+            self._show_preview(filepath)
             
             # Auto-analyze the captured image
             Clock.schedule_once(lambda dt: self.auto_analyze_image(), 0.1)
@@ -1046,6 +1445,33 @@ class MealLoggingScreen(BoxLayout):
             show_popup("Preview Error", f"Could not process photo:\n{str(e)}")
             print(f"Full preview error: {e}")
 
+    def _show_preview(self, path):
+        """
+        Show a thumbnail of path centered in the preview box (90% fit).
+        The full-resolution file stays in self.selected_image for analysis.
+        """
+        img = _load_preview_image(path)
+        img_width, img_height = img.size
+        
+        # Overwrite one GPU texture in place; only reallocate when the thumbnail size changes
+        texture = self._preview_texture
+        if texture is None or texture.size != (img_width, img_height):
+            texture = Texture.create(size=(img_width, img_height), colorfmt='rgba')
+            texture.flip_vertical()  # Pillow rows are top-down
+            self._preview_texture = texture
+        texture.blit_buffer(img.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+        
+        self.ids.img_placeholder.opacity = 0
+        self.ids.img_preview.texture = texture
+        self.ids.img_preview.canvas.ask_update()
+        
+        # Fit entirely inside the container (90%) and center it
+        container = self.ids.img_preview.parent
+        w, h, x, y = _fit_rect(img_width, img_height, container.width, container.height)
+        self.ids.img_preview.size = (w, h)
+        self.ids.img_preview.pos = (container.x + x, container.y + y)
+        self.ids.img_preview.opacity = 1
+
     def _on_file_selection(self, selection):
         """
         Called when the user picks a file using Plyer.
@@ -1067,38 +1493,7 @@ class MealLoggingScreen(BoxLayout):
         # Try preview normally (works for Windows/Mac/Linux/Android for filesystem paths)
         if os.path.exists(path):
             try:
-                self.ids.img_placeholder.opacity = 0
-                self.ids.img_preview.source = path
-                self.ids.img_preview.reload()
-                
-                # Load the image to get its actual dimensions
-                from kivy.core.image import Image as CoreImage
-                img = CoreImage(path)
-                img_width, img_height = img.texture.size
-                img_aspect = img_width / img_height
-                
-                # Get the container (FloatLayout) size
-                container = self.ids.img_preview.parent
-                container_width = container.width
-                container_height = container.height
-                
-                # Calculate size that fits entirely in container
-                if img_aspect > (container_width / container_height):
-                    # Image is wider - fit to width
-                    preview_width = container_width * 0.9  # 90% of container
-                    preview_height = preview_width / img_aspect
-                else:
-                    # Image is taller - fit to height
-                    preview_height = container_height * 0.9  # 90% of container
-                    preview_width = preview_height * img_aspect
-                
-                # Set size and manually center it
-                self.ids.img_preview.size = (preview_width, preview_height)
-                self.ids.img_preview.pos = (
-                    container.x + (container_width - preview_width) / 2,
-                    container.y + (container_height - preview_height) / 2
-                )
-                self.ids.img_preview.opacity = 1
+                self._show_preview(path)
 
                 Clock.schedule_once(lambda dt: self.auto_analyze_image(), 0.1)
                 return
@@ -1119,85 +1514,56 @@ class MealLoggingScreen(BoxLayout):
         Also saves to local storage for analysis.
         """
         try:
-            from jnius import autoclass
-            from android.storage import app_storage_path
-            
-            PythonActivity = autoclass('org.kivy.android.PythonActivity')
-            activity = PythonActivity.mActivity
-            content_resolver = activity.getContentResolver()
-            Uri = autoclass('android.net.Uri')
-            uri = Uri.parse(uri_path)
-            istream = content_resolver.openInputStream(uri)
-            
-            if istream is None:
-                raise RuntimeError("Could not open content URI")
-            
-            # Read the image data
-            data = io.BytesIO()
-            buf = bytearray(8192)
-            while True:
-                read = istream.read(buf)
-                if not read or read == -1:
-                    break
-                data.write(buf[:read])
-            istream.close()
-            data.seek(0)
+            content_resolver = _PythonActivity.mActivity.getContentResolver()
+            uri = _Uri.parse(uri_path)
             
             # Save to local file for analysis
-            temp_dir = app_storage_path()
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            local_path = os.path.join(temp_dir, f"selected_image_{timestamp}.jpg")
+            local_path = os.path.join(self._temp_dir, f"selected_image_{int(time.time() * 1000)}.jpg")
             
-            with open(local_path, 'wb') as f:
-                f.write(data.getvalue())
+            try:
+                # Kernel-side copy between file channels - no bytes pass through Python
+                pfd = content_resolver.openFileDescriptor(uri, "r")
+                if pfd is None:
+                    raise RuntimeError("Could not open content URI")
+                src = _FileInputStream(pfd.getFileDescriptor()).getChannel()
+                dst = _FileOutputStream(local_path).getChannel()
+                try:
+                    size, pos = src.size(), 0
+                    while pos < size:
+                        pos += src.transferTo(pos, size - pos, dst)
+                finally:
+                    src.close()
+                    dst.close()
+                    pfd.close()
+            except Exception as e:
+                # Providers without a seekable descriptor: stream straight to disk
+                print("URI channel copy unavailable, streaming:", e)
+                istream = content_resolver.openInputStream(uri)
+                if istream is None:
+                    raise RuntimeError("Could not open content URI")
+                buf = bytearray(65536)
+                view = memoryview(buf)
+                try:
+                    with open(local_path, 'wb') as f:
+                        while True:
+                            read = istream.read(buf)
+                            if not read or read == -1:
+                                break
+                            f.write(view[:read])
+                finally:
+                    istream.close()
             
             # Update the selected image path to the local file
             self.selected_image = local_path
             print(f"Image saved to: {local_path}")
             
-            # Reset data stream for preview
-            data.seek(0)
-            
-            # Create core image for preview
-            from kivy.core.image import Image as CoreImage
-            core_img = CoreImage(data, ext="jpg")
-            
-            def update_preview(dt):
-                self.ids.img_placeholder.opacity = 0
-                
-                # Get texture dimensions
-                img_width, img_height = core_img.texture.size
-                img_aspect = img_width / img_height
-                
-                # Get container size
-                container = self.ids.img_preview.parent
-                container_width = container.width
-                container_height = container.height
-                
-                # Calculate fitted size
-                if img_aspect > (container_width / container_height):
-                    preview_width = container_width * 0.9
-                    preview_height = preview_width / img_aspect
-                else:
-                    preview_height = container_height * 0.9
-                    preview_width = preview_height * img_aspect
-                
-                # Apply texture and position
-                self.ids.img_preview.texture = core_img.texture
-                self.ids.img_preview.size = (preview_width, preview_height)
-                self.ids.img_preview.pos = (
-                    container.x + (container_width - preview_width) / 2,
-                    container.y + (container_height - preview_height) / 2
-                )
-                self.ids.img_preview.opacity = 1
-            
-            Clock.schedule_once(update_preview, 0)
+            self._show_preview(local_path)
             Clock.schedule_once(lambda dt: self.auto_analyze_image(), 0.1)
             
         except Exception as e:
             print("URI load error:", e)
-            import traceback
-            traceback.print_exc()
+            if DEBUG:
+                traceback.print_exc()
             show_popup("Preview Error", f"Failed to load image:\n{str(e)}")
 
 
@@ -1206,98 +1572,118 @@ class MealLoggingScreen(BoxLayout):
         if not self.selected_image:
             return
         
-        # Prevent duplicate calls
-        if hasattr(self, '_analyzing') and self._analyzing:
-            return
+        # Each analysis gets a new token; results from an older (superseded) image are dropped
+        self._analysis_token += 1
+        token = self._analysis_token
         
-        self._analyzing = True
-        self.ids.status_label.text = "Analyzing image... (10-30 seconds)"
-        self.ids.status_label.color = COLORS['accent1']
-        self.ids.log_btn.disabled = True
+        self._status_label.text = "Analyzing image... (10-30 seconds)"
+        self._status_label.color = _COLOR_ACCENT
+        self._log_btn.disabled = True
         
         # Clear previous values ONLY if fields don't have focus
-        for input_id in ['calories_input', 'proteins_input', 'carbs_input', 'fats_input']:
-            field = self.ids[input_id].ids.input_field
+        for field in self._macro_inputs:
             if not field.focus:  # Only clear if not being edited
                 field.text = ""
         
         # Clear description field ONLY if it doesn't have focus
-        if hasattr(self.ids, 'description_input'):
-            text_field = self.ids.description_input.ids.text_input
-            if not text_field.focus:  # Only clear if not being edited
-                text_field.text = ""
+        if self._desc_in is not None:
+            if not self._desc_in.focus:  # Only clear if not being edited
+                self._desc_in.text = ""
         
         def analyze():
             try:                
-                # Get both nutrition and description
-                nutrition = estimate_nutrition(self.selected_image)
-                description = describe_food(self.selected_image)
+                # Nutrition and description come back from one request, so the photo is
+                # uploaded and decoded once (downscaled to a small JPEG by the encoder)
+                nutrition, description = analyze_food_image(self.selected_image)
                 
+                if token != self._analysis_token:
+                    return
                 if not nutrition:
                     Clock.schedule_once(lambda dt: self._handle_analysis_failure(), 0)
-                    self._analyzing = False
                     return
                 
-                def update_form(dt):
-                    """Safer update: small delay helps keyboard animation complete"""
-                    try:
-                        # Update nutrition fields - CRITICAL FIXES:
-                        # 1. Don't change text if it's already the same
-                        # 2. Don't update focused fields
-                        # 3. NEVER set field.focus = False
-                        fields = {
-                            "calories_input": str(nutrition.get("Calories", 0)),
-                            "proteins_input": str(nutrition.get("Protein", 0)),
-                            "carbs_input": str(nutrition.get("Carbs", 0)),
-                            "fats_input": str(nutrition.get("Fats", 0)),
-                        }
-
-                        for field_id, value in fields.items():
-                            field = self.ids[field_id].ids.input_field
-                            # Only update if: not focused AND value is different
-                            if not getattr(field, "focus", False) and field.text != value:
-                                field.text = value
-
-                        # Set description if available
-                        if description and hasattr(self.ids, 'description_input'):
-                            text_input = self.ids.description_input.ids.text_input
-                            if not getattr(text_input, "focus", False) and text_input.text != description:
-                                text_input.text = description
-                                self.food_description = description
-                                print(f"Description set: {description}")
-
-                        # Defer UI status changes a tiny bit to be safe
-                        Clock.schedule_once(lambda dt: setattr(self.ids.status_label, 'text',
-                                                            "✓ Analysis complete! Review and edit if needed."), 0.02)
-                        Clock.schedule_once(lambda dt: setattr(self.ids.status_label, 'color',
-                                                            (0.2, 0.8, 0.3, 1)), 0.02)
-                        Clock.schedule_once(lambda dt: setattr(self.ids.log_btn, 'disabled', False), 0.02)
-
-                        self._analyzing = False
-
-                    except Exception as e:
-                        print(f"Error updating form: {e}")
-                        traceback.print_exc()
-                        self._analyzing = False
-
-                # Schedule update with a slightly larger delay to avoid keyboard race
-                Clock.schedule_once(update_form, 0.12)
+                # Apply on the next frame, or as soon as the keyboard stops animating
+                self._pending_form = (token, nutrition, description)
+                self._update_form_trigger()
 
                 
             except Exception as e:
-                traceback.print_exc()
+                if DEBUG:
+                    traceback.print_exc()
+                if token != self._analysis_token:
+                    return
                 error_msg = str(e)
                 Clock.schedule_once(lambda dt: self._handle_analysis_failure(error_msg), 0)
-                self._analyzing = False
         
-        threading.Thread(target=analyze, daemon=True).start()
+        _BG.submit(analyze)
+
+    def _on_keyboard_height(self, *args):
+        """Keyboard is moving - hold form writes until it settles"""
+        self._kb_animating = True
+        self._kb_settle_trigger()
+
+    def _on_kb_settled(self, dt):
+        self._kb_animating = False
+        if self._pending_form is not None:
+            self._update_form_trigger()
+
+    def _apply_form(self, dt):
+        """Write analysed values into the form (deferred while the keyboard animates)"""
+        if self._pending_form is None or self._kb_animating:
+            return  # _on_kb_settled re-fires the trigger
+        token, nutrition, description = self._pending_form
+        self._pending_form = None
+        if token != self._analysis_token:
+            return  # A newer image was picked meanwhile
+        try:
+            # Update nutrition fields - CRITICAL FIXES:
+            # 1. Don't change text if it's already the same
+            # 2. Don't update focused fields
+            # 3. NEVER set field.focus = False
+            values = (_fmt(nutrition.get("Calories", 0)), _fmt(nutrition.get("Protein", 0)),
+                      _fmt(nutrition.get("Carbs", 0)), _fmt(nutrition.get("Fats", 0)))
+
+            for field, value in zip(self._macro_inputs, values):
+                # Only update if: not focused AND value is different
+                # (compare normalized text so "123.0" vs "123" doesn't re-render)
+                if getattr(field, "focus", False) or field.text.strip() == value:
+                    continue
+                field.text = value
+
+            # Set description if available
+            if description and self._desc_in is not None:
+                text_input = self._desc_in
+                if not getattr(text_input, "focus", False) and text_input.text != description:
+                    text_input.text = description
+                    self.food_description = description
+                    print(f"Description set: {description}")
+
+            # Defer UI status changes a tiny bit to be safe
+            Clock.schedule_once(self._on_analysis_done, 0.02)
+
+        except Exception as e:
+            print(f"Error updating form: {e}")
+            if DEBUG:
+                traceback.print_exc()
+
+    def _on_analysis_done(self, dt):
+        """Status/button update once the analysed values are in the form"""
+        self._status_label.text = "✓ Analysis complete! Review and edit if needed."
+        self._status_label.color = _COLOR_OK
+        self._log_btn.disabled = False
+
+    def _on_upload_failed(self, dt):
+        """Restore the form after a failed meal upload"""
+        show_popup("Upload Failed", "Could not save meal data. Please check your connection.")
+        self._status_label.text = "Upload failed. Try again."
+        self._status_label.color = _COLOR_ERR
+        self._log_btn.disabled = False
 
     def _handle_analysis_failure(self, error=""):
         """Handle analysis failure"""
-        self.ids.status_label.text = "Analysis failed. Please enter values manually."
-        self.ids.status_label.color = (0.9, 0.3, 0.3, 1)
-        self.ids.log_btn.disabled = False
-        self._analyzing = False
+        self._status_label.text = "Analysis failed. Please enter values manually."
+        self._status_label.color = _COLOR_ERR
+        self._log_btn.disabled = False
         if error:
             show_popup("Analysis Error", f"Could not analyze image: {error}")
     
@@ -1310,54 +1696,86 @@ class MealLoggingScreen(BoxLayout):
         
         meal_type = self.selected_meal_type
         
-        if not self.ids.calories_input.ids.input_field.text.strip():
+        if not self._cal_in.text.strip():
             show_popup("Missing Information", "Please enter at least the calories value!")
             return
         
         try:
             nutrition = {
-                "Calories": int(float(self.ids.calories_input.ids.input_field.text or 0)),
-                "Protein": int(float(self.ids.proteins_input.ids.input_field.text or 0)),
-                "Carbs": int(float(self.ids.carbs_input.ids.input_field.text or 0)),
-                "Fats": int(float(self.ids.fats_input.ids.input_field.text or 0))
+                "Calories": int(float(self._cal_in.text or 0)),
+                "Protein": int(float(self._prot_in.text or 0)),
+                "Carbs": int(float(self._carb_in.text or 0)),
+                "Fats": int(float(self._fat_in.text or 0))
             }
         except ValueError:
             show_popup("Invalid Input", "Please enter valid numbers for all fields!")
             return
         
         self._logging_in_progress = True  # Set flag before opening popup
-        self.ids.log_btn.disabled = True
-        self.ids.status_label.text = "Logging meal..."
-        self.ids.status_label.color = COLORS['accent1']
+        self._log_btn.disabled = True
+        self._status_label.text = "Logging meal..."
+        self._status_label.color = _COLOR_ACCENT
         
         def on_survey(energy, hunger):
             nutrition["energy"], nutrition["hunger"] = energy, hunger
-            today = datetime.date.today().strftime("%Y-%m-%d")
-            success = upload_meal(USER_ID, meal_type, nutrition, today)
-            
-            if success:
-                self._handle_successful_log(meal_type, nutrition, energy, hunger)
-            else:
-                self._logging_in_progress = False  # Reset on failure
-                Clock.schedule_once(lambda dt: (
-                    show_popup("Upload Failed", 
-                        "Could not save meal data. Please check your connection."),
-                    setattr(self.ids.status_label, 'text', "Upload failed. Try again."),
-                    setattr(self.ids.status_label, 'color', (0.9, 0.3, 0.3, 1)),
-                    setattr(self.ids.log_btn, 'disabled', False)), 0)
+            # Upload and tips run off the UI thread; progress comes back via _on_pipeline_event
+            _BG.submit(self._log_pipeline, meal_type, nutrition, energy, hunger)
         
         MealSurveyPopup(callback=on_survey).open()
     
+    def _log_pipeline(self, meal_type, nutrition, energy, hunger):
+        """Background: upload the meal, then fetch tips for it (single worker, in order)"""
+        def emit(event, payload=None):
+            Clock.schedule_once(partial(self._on_pipeline_event, event, payload), 0)
+        
+        try:
+            today = _today_str()
+            if not upload_meal(USER_ID, meal_type, nutrition, today):
+                emit('upload_failed')
+                return
+            emit('uploaded', (meal_type, nutrition, energy, hunger))
+            
+            try:
+                goals = getattr(self.chat_screen, 'daily_goal_macros', DEFAULT_MACRO_GOALS)
+                advice = handle_logged_meal(meal_type, nutrition, _macros_dict(goals), energy, hunger)
+                emit('tips', advice.strip() if advice else "All nutrients within range.")
+            except Exception:
+                if DEBUG:
+                    traceback.print_exc()
+                emit('tips_failed')
+        finally:
+            emit('done')
+    
+    def _on_pipeline_event(self, event, payload, dt):
+        """UI-thread side of _log_pipeline"""
+        if event == 'uploaded':
+            self._handle_successful_log(*payload)
+        elif event == 'upload_failed':
+            self._on_upload_failed(dt)
+        elif event == 'tips':
+            self.chat_screen.remove_last_message()
+            self.chat_screen.add_message(payload, False)
+        elif event == 'tips_failed':
+            self.chat_screen.remove_last_message()
+        elif event == 'done':
+            self._logging_in_progress = False
+    
+    def _on_log_posted(self, meal_type, result, meal_macros):
+        chat = self.chat_screen
+        chat.add_message(result, False)
+        chat.apply_meal_delta(meal_type, meal_macros)
+        chat.add_message("Generating tips...", False)
+
     def _handle_successful_log(self, meal_type, nutrition, energy, hunger):
-        """Handle successful meal logging"""
-        self.ids.status_label.text = "✓ Meal logged successfully!"
-        self.ids.status_label.color = (0.2, 0.8, 0.3, 1)
+        """Handle successful meal logging (UI thread)"""
+        self._status_label.text = "✓ Meal logged successfully!"
+        self._status_label.color = _COLOR_OK
         self.chat_screen.current_meal_type = meal_type
         
         # Get description from text field if available
         description = ""
-        if hasattr(self.ids, 'description_input'):
-            description = self.ids.description_input.ids.text_input.text.strip()
+        if self._desc_in is not None:
+            description = self._desc_in.text.strip()
         
         # Build result message
         result = f"{meal_type.capitalize()} logged:\n"
@@ -1369,29 +1787,11 @@ class MealLoggingScreen(BoxLayout):
                 f"Fats: {nutrition.get('Fats')} g\n"
                 f"Energy: {energy}/5\nHunger: {hunger}/5")
         
-        Clock.schedule_once(lambda dt: self.chat_screen.add_message(result, False), 0)
-        Clock.schedule_once(lambda dt: self.chat_screen.load_macros(), 1.5)
-        
-        # Generate tips
-        Clock.schedule_once(lambda dt: self.chat_screen.add_message("Generating tips...", False), 0)
-        
-        def tips():
-            try:
-                time.sleep(1.0)
-                advice = handle_logged_meal(meal_type, nutrition, 
-                                            self.chat_screen.daily_goal_macros,
-                                            energy, hunger)
-                Clock.schedule_once(lambda dt: self.chat_screen.remove_last_message(), 0)
-                msg = advice.strip() if advice else "All nutrients within range."
-                Clock.schedule_once(lambda dt: self.chat_screen.add_message(msg, False), 0)
-            except:
-                traceback.print_exc()
-                Clock.schedule_once(lambda dt: self.chat_screen.remove_last_message(), 0)
-            finally:
-                # Reset flag after tips complete
-                Clock.schedule_once(lambda dt: setattr(self, '_logging_in_progress', False), 0)
-        
-        threading.Thread(target=tips, daemon=True).start()
+        # Post the summary, update the header from the values just written (instead of
+        # re-fetching the day) and show the tips placeholder. Done inline so the
+        # placeholder is in place before the pipeline's tips event is handled.
+        meal_macros = [int(nutrition.get(k) or 0) for k in ('Calories', 'Protein', 'Carbs', 'Fats')]
+        self._on_log_posted(meal_type, result, meal_macros)
         
         Clock.schedule_once(lambda dt: self.go_back(None), 2.5)
 
@@ -1399,59 +1799,81 @@ class MealLoggingScreen(BoxLayout):
 # MEAL SURVEY POPUP
 # ==============================
 class MealSurveyPopup(Popup):
+    # Rating button colors
+    _SELECTED = (0.2, 0.6, 1, 1)
+    _UNSELECTED = (0.5, 0.5, 0.5, 1)
+    
     def __init__(self, callback, **kwargs):
         super().__init__(**kwargs)
         self.callback = callback
         self.energy_value = None
         self.hunger_value = None
-        self._submitted = False  # ADD THIS FLAG
+        # Repeated taps on Submit within 300 ms collapse into one submission
+        self._submit_trigger = Clock.create_trigger(self._do_submit, 0.3)
+        # One-shot: a tap during the dismiss animation must not log the meal again
+        self._submitted = False
         
         # Create buttons after popup is built
         Clock.schedule_once(self._create_buttons, 0)
     
     def _create_buttons(self, dt):
+        # Each row is filled off-tree and attached once, so the popup lays it out in one pass
         # Energy buttons
-        energy_layout = self.ids.energy_layout
+        energy_row = BoxLayout(orientation='horizontal', spacing=dp(10))
         self.energy_buttons = []
         for i in range(1, 6):
-            btn = Button(text=str(i), background_color=(0.5, 0.5, 0.5, 1), 
+            btn = Button(text=str(i), background_color=self._UNSELECTED, 
                         font_size='18sp', bold=True)
-            btn.bind(on_press=lambda x, val=i: self.select_energy(val))
+            btn.value = i
+            btn.bind(on_press=self._on_energy_press)
             self.energy_buttons.append(btn)
-            energy_layout.add_widget(btn)
+            energy_row.add_widget(btn)
+        self.ids.energy_layout.add_widget(energy_row)
         
         # Hunger buttons
-        hunger_layout = self.ids.hunger_layout
+        hunger_row = BoxLayout(orientation='horizontal', spacing=dp(10))
         self.hunger_buttons = []
         for i in range(1, 6):
-            btn = Button(text=str(i), background_color=(0.5, 0.5, 0.5, 1), 
+            btn = Button(text=str(i), background_color=self._UNSELECTED, 
                         font_size='18sp', bold=True)
-            btn.bind(on_press=lambda x, val=i: self.select_hunger(val))
+            btn.value = i
+            btn.bind(on_press=self._on_hunger_press)
             self.hunger_buttons.append(btn)
-            hunger_layout.add_widget(btn)
+            hunger_row.add_widget(btn)
+        self.ids.hunger_layout.add_widget(hunger_row)
+    
+    def _on_energy_press(self, instance):
+        self.select_energy(instance.value)
+    
+    def _on_hunger_press(self, instance):
+        self.select_hunger(instance.value)
     
     def select_energy(self, value):
+        if self.energy_value == value:
+            return
         self.energy_value = value
+        selected, unselected = self._SELECTED, self._UNSELECTED
         for i, btn in enumerate(self.energy_buttons, 1):
-            btn.background_color = (0.2, 0.6, 1, 1) if i == value else (0.5, 0.5, 0.5, 1)
+            btn.background_color = selected if i == value else unselected
     
     def select_hunger(self, value):
+        if self.hunger_value == value:
+            return
         self.hunger_value = value
+        selected, unselected = self._SELECTED, self._UNSELECTED
         for i, btn in enumerate(self.hunger_buttons, 1):
-            btn.background_color = (0.2, 0.6, 1, 1) if i == value else (0.5, 0.5, 0.5, 1)
+            btn.background_color = selected if i == value else unselected
     
     def submit(self, instance):
-        # CRITICAL FIX: Prevent duplicate submissions
+        self._submit_trigger()
+    
+    def _do_submit(self, dt):
         if self._submitted:
-            print("[DEBUG] Survey already submitted, ignoring duplicate call")
             return
-        
         if self.energy_value is None or self.hunger_value is None:
             show_popup("Incomplete Selection", 
                       "Please select both Energy and Hunger levels")
             return
-        
-        # Mark as submitted BEFORE calling callback
         self._submitted = True
         
         # Call the callback
@@ -1467,73 +1889,77 @@ class UserMacroGoals(BoxLayout):
     def __init__(self, chat_screen, **kwargs):
         super().__init__(**kwargs)
         self.chat_screen = chat_screen
+        self._save_in_flight = False
+        self._clear_status_trigger = Clock.create_trigger(
+            lambda dt: setattr(self.ids.status_label, 'text', ''), 3)
         self.load_current_goals()
     
     def load_current_goals(self):
-        """Load current macro goals from Firebase and populate fields"""
+        """Load current macro goals (cached copy first, then refreshed from Firebase)"""
+        cached = _cached_user_doc(USER_ID)
+        cached_goals = (cached or {}).get('daily_macros_goal')
+        if cached_goals:
+            Clock.schedule_once(lambda dt: self._populate_fields(cached_goals), 0)
+        
         def load():
             try:
                 user_doc = get_user_doc(USER_ID)
-                if user_doc and 'daily_macros_goal' in user_doc:
+                if user_doc is None:
+                    return
+                _store_user_doc(USER_ID, user_doc)
+                if 'daily_macros_goal' in user_doc:
                     goals = user_doc['daily_macros_goal']
+                    if goals == cached_goals:
+                        return  # Already on screen
                     Clock.schedule_once(lambda dt: self._populate_fields(goals), 0)
             except Exception as e:
                 print(f"Error loading macro goals: {e}")
-                traceback.print_exc()
+                if DEBUG:
+                    traceback.print_exc()
         
-        threading.Thread(target=load, daemon=True).start()
+        _BG.submit(load)
     
     def _populate_fields(self, goals):
         """Populate input fields with current goals"""
-        if 'calories' in goals:
-            self.ids.calories_input.ids.input_field.text = str(goals['calories'])
-        if 'proteins' in goals:
-            self.ids.proteins_input.ids.input_field.text = str(goals['proteins'])
-        if 'carbs' in goals:
-            self.ids.carbs_input.ids.input_field.text = str(goals['carbs'])
-        if 'fats' in goals:
-            self.ids.fats_input.ids.input_field.text = str(goals['fats'])
+        for key in MACRO_KEYS:
+            value = goals.get(key)
+            if value is not None:
+                self.ids[f'{key}_input'].ids.input_field.text = str(value)
     
     def save_goals(self, instance):
         """Save macro goals to Firebase"""
+        if self._save_in_flight:
+            return
+        
         # Get values from input fields
         calories_text = self.ids.calories_input.ids.input_field.text.strip()
         proteins_text = self.ids.proteins_input.ids.input_field.text.strip()
         carbs_text = self.ids.carbs_input.ids.input_field.text.strip()
         fats_text = self.ids.fats_input.ids.input_field.text.strip()
         
-        # Build update dict - only include non-empty fields
+        # Build update dict - only include non-empty, valid fields
+        fields = (('calories', calories_text), ('proteins', proteins_text),
+                  ('carbs', carbs_text), ('fats', fats_text))
         updates = {}
-        if calories_text:
-            try:
-                updates['calories'] = int(float(calories_text))
-            except ValueError:
-                pass
-        
-        if proteins_text:
-            try:
-                updates['proteins'] = int(float(proteins_text))
-            except ValueError:
-                pass
-        
-        if carbs_text:
-            try:
-                updates['carbs'] = int(float(carbs_text))
-            except ValueError:
-                pass
-        
-        if fats_text:
-            try:
-                updates['fats'] = int(float(fats_text))
-            except ValueError:
-                pass
+        for key, text in fields:
+            value = _parse_int(text)
+            if value is not None:
+                updates[key] = value
         
         # If no valid updates, show message and return
         if not updates:
             self.show_status("No changes to save", error=True)
             return
         
+        # Skip the write when nothing differs from recently fetched goals; a stale cache
+        # (e.g. goals changed on another device) never short-circuits a real save
+        current_goals = (_cached_user_doc(USER_ID) or {}).get('daily_macros_goal') or {}
+        if all(current_goals.get(k) == v for k, v in updates.items()):
+            self.show_status("No changes to save")
+            return
+        
         # Disable save button during upload
+        self._save_in_flight = True
         self.ids.save_btn.disabled = True
         self.ids.save_btn.text = "Saving..."
         
@@ -1542,30 +1968,37 @@ class UserMacroGoals(BoxLayout):
             try:
                 success = update_macro_goals(USER_ID, updates)
                 if success:
+                    cached = _cached_user_doc(USER_ID, ttl=float('inf'))
+                    if cached is not None:
+                        goals = dict(cached.get('daily_macros_goal') or {}, **updates)
+                        _store_user_doc(USER_ID, dict(cached, daily_macros_goal=goals))
                     Clock.schedule_once(lambda dt: self.show_status("Goals saved successfully!", error=False), 0)
-                    Clock.schedule_once(lambda dt: self.chat_screen.load_macros(), 0.5)
+                    Clock.schedule_once(lambda dt: self.chat_screen.load_macros(force=True), 0.5)
                 else:
                     Clock.schedule_once(lambda dt: self.show_status("Failed to save goals", error=True), 0)
             except Exception as e:
                 print(f"Error saving goals: {e}")
-                traceback.print_exc()
+                if DEBUG:
+                    traceback.print_exc()
                 Clock.schedule_once(lambda dt: self.show_status("Error saving goals", error=True), 0)
             finally:
                 Clock.schedule_once(lambda dt: self._reset_button(), 0)
         
-        threading.Thread(target=upload, daemon=True).start()
+        _BG.submit(upload)
     
     def _reset_button(self):
         """Reset save button state"""
+        self._save_in_flight = False
         self.ids.save_btn.disabled = False
         self.ids.save_btn.text = "Save Goals"
     
     def show_status(self, message, error=False):
         """Show status message"""
         self.ids.status_label.text = message
-        self.ids.status_label.color = get_color_from_hex("#FF6B6B") if error else get_color_from_hex("#B0CA87")
-        # Clear message after 3 seconds
-        Clock.schedule_once(lambda dt: setattr(self.ids.status_label, 'text', ''), 3)
+        self.ids.status_label.color = _COLOR_STATUS_ERR if error else _COLOR_STATUS_OK
+        # Clear message 3 seconds after the latest update (one pending clear at most)
+        self._clear_status_trigger.cancel()
+        self._clear_status_trigger()
     
     def go_back(self, instance):
         """Return to chat screen"""
@@ -1575,54 +2008,6 @@ class UserMacroGoals(BoxLayout):
 # =============================
 # RECIPE GENERATOR SCREEN
 # =============================
-def _display_image(self, filepath):
-    """Display selected image"""
-    try:
-        self.current_image_path = filepath
-        
-        # Hide placeholder
-        self.ids.img_placeholder.opacity = 0
-        
-        # Load image source
-        self.ids.img_preview.source = filepath
-        self.ids.img_preview.reload()
-        
-        # Load the image to get its actual dimensions
-        from kivy.core.image import Image as CoreImage
-        img = CoreImage(filepath)
-        img_width, img_height = img.texture.size
-        img_aspect = img_width / img_height
-        
-        # Get the container (FloatLayout) size
-        container = self.ids.img_preview.parent
-        container_width = container.width
-        container_height = container.height
-        
-        # Calculate size that fits entirely in container
-        if img_aspect > (container_width / container_height):
-            # Image is wider - fit to width
-            preview_width = container_width * 0.9  # 90% of container
-            preview_height = preview_width / img_aspect
-        else:
-            # Image is taller - fit to height
-            preview_height = container_height * 0.9  # 90% of container
-            preview_width = preview_height * img_aspect
-        
-        # Set size and manually center it
-        self.ids.img_preview.size = (preview_width, preview_height)
-        self.ids.img_preview.pos = (
-            container.x + (container_width - preview_width) / 2,
-            container.y + (container_height - preview_height) / 2
-        )
-        self.ids.img_preview.opacity = 1
-        
-        self.show_status("Image loaded successfully")
-        
-    except Exception as e:
-        print(f"[Recipe] Error displaying image: {e}")
-        traceback.print_exc()
-        self.show_status("Failed to display image", error=True)
-
 
 # ============================================
 # COMPLETE UPDATED RecipeGenerator CLASS
@@ -1634,13 +2019,13 @@ class RecipeGenerator(BoxLayout):
         super().__init__(**kwargs)
         self.chat_screen = chat_screen
         self.current_image_path = None
+        # Collapse a burst of Generate taps into a single request
+        self._gen_trigger = Clock.create_trigger(self._do_generate, 0.25)
     
     def take_photo(self, instance):
         """Take a photo using camera"""
         try:
             if platform == 'android':
-                from android.permissions import request_permissions, Permission, check_permission
-                
                 if not check_permission(Permission.CAMERA):
                     request_permissions([Permission.CAMERA], self._on_camera_permission_result)
                     return
@@ -1668,18 +2053,11 @@ class RecipeGenerator(BoxLayout):
     
     def _open_camera_widget(self):
         """Open camera using Kivy Camera widget"""
-        from kivy.uix.camera import Camera
-        from kivy.uix.button import Button
-        from kivy.uix.boxlayout import BoxLayout
-        from kivy.uix.floatlayout import FloatLayout
-        from kivy.uix.popup import Popup
-        from kivy.graphics import PushMatrix, PopMatrix, Rotate
-        
         camera_container = FloatLayout()
         
         camera_widget = Camera(
             play=True, 
-            resolution=(1280, 720), 
+            resolution=RECIPE_CAMERA_RESOLUTION, 
             index=0,
             size_hint=(None, None),
             allow_stretch=True
@@ -1705,7 +2083,10 @@ class RecipeGenerator(BoxLayout):
             
             rotation.origin = (camera_widget.center_x, camera_widget.center_y)
         
-        camera_container.bind(pos=update_camera_transform, size=update_camera_transform)
+        # One transform update per frame however many pos/size events arrive
+        self._cam_transform_trigger = Clock.create_trigger(
+            lambda dt: update_camera_transform(camera_container, None), -1)
+        camera_container.bind(pos=self._cam_transform_trigger, size=self._cam_transform_trigger)
         camera_container.add_widget(camera_widget)
         
         button_layout = BoxLayout(
@@ -1740,20 +2121,21 @@ class RecipeGenerator(BoxLayout):
         def capture_photo(instance):
             try:
                 if platform == 'android':
-                    from android.storage import app_storage_path
                     temp_dir = app_storage_path()
                 else:
                     temp_dir = os.path.expanduser("~")
                 
                 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                filepath = os.path.join(temp_dir, f"recipe_photo_{timestamp}.png")
+                filepath = os.path.join(temp_dir, f"recipe_photo_{timestamp}.jpg")
                 
-                camera_widget.export_to_png(filepath)
+                # Grab the raw frame on the UI thread, then close the camera right away
+                texture = camera_widget.texture
+                pixels, size = texture.pixels, texture.size
                 camera_widget.play = False
                 camera_popup.dismiss()
                 
-                print(f"Photo saved to: {filepath}")
-                Clock.schedule_once(lambda dt: self._display_image(filepath), 0.1)
+                # Encode + write off the UI thread, then show it
+                _BG.submit(self._persist_capture, pixels, size, filepath)
                 
             except Exception as e:
                 camera_widget.play = False
@@ -1771,16 +2153,32 @@ class RecipeGenerator(BoxLayout):
         camera_popup.open()
         Clock.schedule_once(lambda dt: update_camera_transform(camera_container, None), 0.1)
     
+    def _persist_capture(self, pixels, size, filepath):
+        """Background: save a captured camera frame as JPEG and display it"""
+        try:
+            img = PILImage.frombytes('RGBA', size, pixels)
+            # GL rows are bottom-up and the preview showed the frame rotated 270°
+            img = img.transpose(PILImage.FLIP_TOP_BOTTOM).transpose(PILImage.ROTATE_270)
+            img = img.convert('RGB')
+            img.thumbnail((RECIPE_CAPTURE_MAX_SIDE, RECIPE_CAPTURE_MAX_SIDE), PILImage.BILINEAR)
+            img.save(filepath, 'JPEG', quality=80)
+            print(f"Photo saved to: {filepath}")
+            Clock.schedule_once(lambda dt: self._display_image(filepath), 0)
+        except Exception as e:
+            print(f"Capture error: {e}")
+            msg = f"Could not capture photo: {str(e)}"
+            Clock.schedule_once(lambda dt: self.show_status(msg, error=True), 0)
+    
     def upload_image(self, instance):
         """Upload an image from gallery"""
         try:
             if platform == 'android':
-                from android.permissions import request_permissions, Permission
                 request_permissions([Permission.READ_EXTERNAL_STORAGE])
             filechooser.open_file(on_selection=self.on_file_selected, filters=['*.jpg', '*.png', '*.jpeg'])
         except Exception as e:
             print(f"[Recipe] File chooser error: {e}")
-            traceback.print_exc()
+            if DEBUG:
+                traceback.print_exc()
             self.show_status("Failed to open file chooser", error=True)
     
     def on_file_selected(self, selection):
@@ -1791,44 +2189,51 @@ class RecipeGenerator(BoxLayout):
     def _display_image(self, filepath):
         """Display selected image"""
         try:
+            # Original stays the upload path; the widget only ever sees a thumbnail
             self.current_image_path = filepath
             
-            self.ids.img_placeholder.opacity = 0
-            self.ids.img_preview.source = filepath
-            self.ids.img_preview.reload()
-            
-            from kivy.core.image import Image as CoreImage
-            img = CoreImage(filepath)
-            img_width, img_height = img.texture.size
-            img_aspect = img_width / img_height
-            
-            container = self.ids.img_preview.parent
-            container_width = container.width
-            container_height = container.height
+            # Pillow reads only the header for .size - no second full decode
+            with PILImage.open(filepath) as im:
+                img_width, img_height = im.size
+                
+                container = self.ids.img_preview.parent
+                w, h, x, y = _fit_rect(img_width, img_height, container.width, container.height)
+                
+                # Thumbnail at 2x the on-screen size (sharp on high-dpi, tiny next to the photo)
+                im.draft("RGB", (int(w * 2), int(h * 2)))
+                thumb = im.convert("RGB")
+                thumb.thumbnail((max(int(w * 2), 1), max(int(h * 2), 1)), PILImage.LANCZOS)
+            thumb_path = _derived_path(filepath, "_thumb.jpg")
+            thumb.save(thumb_path, "JPEG", quality=85)
             
-            if img_aspect > (container_width / container_height):
-                preview_width = container_width * 0.9
-                preview_height = preview_width / img_aspect
+            self.ids.img_placeholder.opacity = 0
+            if self.ids.img_preview.source == thumb_path:
+                self.ids.img_preview.reload()
             else:
-                preview_height = container_height * 0.9
-                preview_width = preview_height * img_aspect
+                self.ids.img_preview.source = thumb_path
             
-            self.ids.img_preview.size = (preview_width, preview_height)
-            self.ids.img_preview.pos = (
-                container.x + (container_width - preview_width) / 2,
-                container.y + (container_height - preview_height) / 2
-            )
+            self.ids.img_preview.size = (w, h)
+            self.ids.img_preview.pos = (container.x + x, container.y + y)
             self.ids.img_preview.opacity = 1
             
             self.show_status("Image loaded successfully")
             
         except Exception as e:
             print(f"[Recipe] Error displaying image: {e}")
-            traceback.print_exc()
+            if DEBUG:
+                traceback.print_exc()
             self.show_status("Failed to display image", error=True)
     
     def generate_recipe(self, instance):
         """Generate recipe based on text and/or image input"""
+        if self.ids.generate_btn.disabled:
+            return
+        self._gen_trigger()
+    
+    def _do_generate(self, dt):
+        """Validate input and start the recipe request (debounced)"""
+        if self.ids.generate_btn.disabled:
+            return
         text_prompt = self.ids.recipe_input.ids.text_input.text.strip()
         has_image = self.current_image_path is not None
         
@@ -1841,8 +2246,8 @@ class RecipeGenerator(BoxLayout):
         self.ids.generate_btn.disabled = True
         self.ids.generate_btn.text = "Generating..."
         
-        # Process in background thread
-        threading.Thread(target=self._process_recipe_request, args=(text_prompt, has_image), daemon=True).start()
+        # Process on the shared background pool
+        _BG.submit(self._process_recipe_request, text_prompt, has_image)
     
     def _process_recipe_request(self, text_prompt, has_image):
         """Process the recipe generation request"""
@@ -1853,17 +2258,19 @@ class RecipeGenerator(BoxLayout):
             
             # Case 2: Text only
             elif text_prompt and not has_image:
-                response = get_recipe_from_text(text_prompt)
+                response = get_recipe_from_text(text_prompt, on_progress=self._make_progress_callback())
                 Clock.schedule_once(lambda dt: self._display_response(response), 0)
             
             # Case 3: Both text and image
             elif text_prompt and has_image:
-                response = get_recipe_from_text_and_image(text_prompt, self.current_image_path)
+                response = get_recipe_from_text_and_image(text_prompt, self.current_image_path,
+                                                          on_progress=self._make_progress_callback())
                 Clock.schedule_once(lambda dt: self._display_response(response), 0)
         
         except Exception as e:
             print(f"[Recipe] Error generating recipe: {e}")
-            traceback.print_exc()
+            if DEBUG:
+                traceback.print_exc()
             Clock.schedule_once(lambda dt: self._display_response("Failed to generate recipe. Please try again."), 0)
         finally:
             Clock.schedule_once(lambda dt: self._reset_button(), 0)
@@ -1876,20 +2283,35 @@ class RecipeGenerator(BoxLayout):
             try:
                 description = describe_food(self.current_image_path)
                 
-                if description and any(word in description.lower() for word in ['ingredient', 'vegetable', 'produce', 'raw', 'fresh']):
-                    recipe = get_recipe_from_image(self.current_image_path)
+                if description and _INGREDIENT_RE.search(description):
+                    recipe = get_recipe_from_image(self.current_image_path, on_progress=self._make_progress_callback())
                     Clock.schedule_once(lambda dt: self._display_response(recipe), 0)
                 else:
                     message = f"Image description: {description}\n\nThis doesn't appear to be ingredients. Please provide a text prompt describing what recipe you'd like to generate."
                     Clock.schedule_once(lambda dt: self._display_response(message), 0)
             except Exception as e:
                 print(f"[Recipe] Error analyzing image: {e}")
-                traceback.print_exc()
+                if DEBUG:
+                    traceback.print_exc()
                 Clock.schedule_once(lambda dt: self._display_response("Failed to analyze image. Please try again or add a text prompt."), 0)
             finally:
                 Clock.schedule_once(lambda dt: self._reset_button(), 0)
         
-        threading.Thread(target=analyze, daemon=True).start()
+        _BG.submit(analyze)
+    
+    def _make_progress_callback(self):
+        """Streaming callback (background thread): show the latest recipe text every few pieces"""
+        parts = []
+        
+        def on_progress(chunk):
+            parts.append(chunk)
+            if len(parts) % RECIPE_PROGRESS_EVERY == 0:
+                Clock.schedule_once(partial(self._show_recipe_progress, ''.join(parts)), 0)
+        return on_progress
+    
+    def _show_recipe_progress(self, text, dt):
+        # The status line only has room for the most recent words
+        self.show_status(f"Writing recipe... {text.strip()[-60:]}")
     
     def _display_response(self, response):
         """Display the generated recipe in a popup"""
@@ -1904,7 +2326,7 @@ class RecipeGenerator(BoxLayout):
     def show_status(self, message, error=False):
         """Show status message"""
         self.ids.status_label.text = message
-        self.ids.status_label.color = get_color_from_hex("#FF6B6B") if error else get_color_from_hex("#B0CA87")
+        self.ids.status_label.color = _COLOR_STATUS_ERR if error else _COLOR_STATUS_OK
     
     def go_back(self, instance):
         """Return to chat screen"""
@@ -1912,11 +2334,11 @@ class RecipeGenerator(BoxLayout):
         App.get_running_app().root.add_widget(self.chat_screen)
 
 class RecipePopup(Popup):
-    recipe_text = StringProperty("") 
-
     def __init__(self, recipe_text, **kwargs):
         super().__init__(**kwargs)
+        # Set once and never changes, so a plain attribute instead of a property
         self.recipe_text = recipe_text
+        self.ids.recipe_label.text = recipe_text
 
 # ==============================
 # MAIN APP
@@ -1937,9 +2359,17 @@ class DietChatApp(App):
                 if db is None:
                     print("[WARNING] Firebase failed, continuing...")
                 
-                Clock.schedule_once(lambda dt: self.loading.update_status(
-                    "Loading AI model... (30-60 sec)", 50), 0)
-                load_model()
+                if _disk_cache_read('server_health', ttl=SERVER_HEALTH_TTL):
+                    # Server answered recently: start now and re-check in the background
+                    _BG.submit(self._check_server)
+                else:
+                    Clock.schedule_once(lambda dt: self.loading.update_status(
+                        "Loading AI model... (30-60 sec)", 50), 0)
+                    if not self._check_server():
+                        Clock.schedule_once(lambda dt: self.loading.update_status(
+                            "AI server unavailable - meal analysis is offline", 90), 0)
+                        Clock.schedule_once(lambda dt: self.switch_to_main(), 2.5)
+                        return
                 
                 Clock.schedule_once(lambda dt: self.loading.update_status(
                     "Model loaded ✓", 90), 0)
@@ -1947,11 +2377,23 @@ class DietChatApp(App):
                     "Starting app...", 95), 0)
                 Clock.schedule_once(lambda dt: self.switch_to_main(), 0.5)
             except:
-                traceback.print_exc()
+                if DEBUG:
+                    traceback.print_exc()
                 Clock.schedule_once(lambda dt: self.loading.update_status(
                     "Error occurred", 0), 0)
         
-        threading.Thread(target=init, daemon=True).start()
+        _BG.submit(init)
+    
+    def _check_server(self):
+        """Check the remote model server and remember a healthy result across launches"""
+        if check_server_health():
+            print("[LLM] Remote model ready")
+            _disk_cache_write('server_health', {'ok': True})
+            return True
+        print("[LLM] WARNING: Cannot connect to remote server!")
+        print("[LLM] Make sure remote model program is running and NGROK_URL is correct")
+        _disk_cache_drop('server_health')
+        return False
     
     def switch_to_main(self):
         self.loading.update_status("Ready!", 100)
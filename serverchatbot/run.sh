@@ -21,8 +21,8 @@ if docker run --rm --gpus all nvidia/cuda:12.1.0-base-ubuntu22.04 nvidia-smi > /
     echo -e "${GREEN}✓ NVIDIA GPU support detected${NC}"
     GPU_FLAG="--gpus all"
 else
-    echo -e "${YELLOW}⚠ No GPU support detected. Running in CPU mode.${NC}"
-    GPU_FLAG=""
+    echo -e "${YELLOW}⚠ No GPU support detected. Running in CPU mode (very slow).${NC}"
+    GPU_FLAG="-e ALLOW_CPU_INFERENCE=1"
 fi
 
 # Set image and container names
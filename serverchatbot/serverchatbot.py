@@ -1,66 +1,192 @@
-import torch
 import os
-import json
+# Keep transformers from probing for TensorFlow/Flax at import time (PyTorch only here)
+os.environ.setdefault("TRANSFORMERS_NO_TF", "1")
+os.environ.setdefault("TRANSFORMERS_NO_FLAX", "1")
+os.environ.setdefault("USE_TF", "0")
+os.environ.setdefault("USE_FLAX", "0")
+os.environ.setdefault("TRANSFORMERS_VERBOSITY", "error")
 
-from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor, BitsAndBytesConfig
+import torch
+import copy
+import queue
+import atexit
+import time
+import hashlib
+import importlib.util
+from threading import Thread, Lock
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from collections import OrderedDict
+
+from transformers import AutoProcessor, BitsAndBytesConfig, TextIteratorStreamer
+from transformers import StoppingCriteria, StoppingCriteriaList, PreTrainedTokenizerFast, DynamicCache
+from transformers import LogitsProcessor, LogitsProcessorList
 from PIL import Image
-from flask import Flask, request, jsonify
-import base64
+from flask import Flask, request, jsonify, Response
+try:
+    # SIMD base64 decoder when installed; same API as the stdlib
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+try:
+    # C JSON parser when installed; only used for the model's nutrition reply
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 from io import BytesIO
-import traceback
-import requests
-from pyngrok import ngrok
+import logging
+import logging.handlers
 
 
 model_path = "models/Qwen2.5-VL-7B-Instruct"
 
+# Errors are logged through a queue: request and batcher threads only enqueue the record,
+# and a listener thread formats the traceback and writes it out
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Same process, so the record can go over as-is; the stock prepare() would
+        # format the message and traceback here, on the calling thread
+        return record
+
+log = logging.getLogger("llm")
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_queue = queue.Queue()
+log.addHandler(_DeferredQueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)  # flush pending records on shutdown
+
 print("[LLM] Loading model…")
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"[LLM] Using device: {device}")
+# Half precision on GPU (BF16 where supported, e.g. Ampere+), FP32 on CPU
+if device == "cuda":
+    dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+else:
+    dtype = torch.float32
+# Let any remaining FP32 matmuls use TF32 tensor cores
+torch.set_float32_matmul_precision("high")
+if device == "cuda":
+    # SDPA backends used when FlashAttention-2 isn't installed
+    torch.backends.cuda.enable_flash_sdp(True)
+    torch.backends.cuda.enable_mem_efficient_sdp(True)
+print(f"[LLM] Using device: {device} ({dtype})")
+if device == "cpu" and os.environ.get("ALLOW_CPU_INFERENCE") != "1":
+    # A 7B VLM on CPU takes tens of seconds per reply and every client queues behind it
+    raise SystemExit("[LLM] No CUDA GPU found. Refusing to serve on CPU; "
+                     "set ALLOW_CPU_INFERENCE=1 to run anyway (very slow).")
 print(f"[LLM] PyTorch version: {torch.__version__}")
 
 print("[LLM] Loading processor...")
 processor = AutoProcessor.from_pretrained(
     model_path,
     trust_remote_code=True,
+    use_fast=True,
 )
+if not isinstance(processor.tokenizer, PreTrainedTokenizerFast):
+    print("[LLM] Warning: fast tokenizer unavailable, using the slow Python tokenizer")
+# Decoder-only batches must be padded on the left so every prompt ends where generation starts
+processor.tokenizer.padding_side = "left"
+
+# Vision-token budget: one token per 28x28 pixels (14 px patches, 2x2 merge). Uploads are
+# decoded at 224x224 = 64 tokens; cap there so a larger image can never inflate prefill, and
+# keep the floor low so the processor never upscales a small image to reach it.
+VISION_MIN_PIXELS = 4 * 28 * 28
+VISION_MAX_PIXELS = 64 * 28 * 28
+processor.image_processor.min_pixels = VISION_MIN_PIXELS
+processor.image_processor.max_pixels = VISION_MAX_PIXELS
+if isinstance(getattr(processor.image_processor, "size", None), dict):
+    # Newer transformers read the budget from size instead
+    processor.image_processor.size = {"shortest_edge": VISION_MIN_PIXELS, "longest_edge": VISION_MAX_PIXELS}
 
 print("[LLM] Loading model...")
 
-# Use the EXACT same configuration that works in VSCode
-model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-    model_path,
-    trust_remote_code=True,
-    torch_dtype=torch.float16 if device == "cuda" else torch.float32,
-    low_cpu_mem_usage=True,
-    device_map="auto" if device == "cuda" else None,
-)
-
-# Apply quantization AFTER loading if on CUDA
+# FlashAttention-2 needs the flash-attn package and a half-precision CUDA model; otherwise SDPA
+if device == "cuda" and importlib.util.find_spec("flash_attn") is not None:
+    attn_implementation = "flash_attention_2"
+else:
+    attn_implementation = "sdpa"
+
+def _load_model(quantization_config=None):
+    global attn_implementation
+    # Imported here so the model module is only pulled in when weights are actually loaded
+    from transformers import Qwen2_5_VLForConditionalGeneration
+    load = lambda: Qwen2_5_VLForConditionalGeneration.from_pretrained(
+        model_path,
+        trust_remote_code=True,
+        quantization_config=quantization_config,
+        torch_dtype=dtype,
+        low_cpu_mem_usage=True,
+        device_map="auto" if device == "cuda" else None,
+        attn_implementation=attn_implementation,
+    )
+    try:
+        return load()
+    except (ImportError, ValueError) as e:
+        if attn_implementation != "flash_attention_2":
+            raise
+        print(f"[LLM] FlashAttention-2 unavailable, using SDPA: {e}")
+        attn_implementation = "sdpa"
+        return load()
+
+# Quantization is decided before loading, so the weights are read only once
+# (a quantized reload used to keep a second full-precision copy resident)
+model = None
 if device == "cuda":
     try:
-        print("[LLM] Applying 8-bit quantization...")
-        from transformers import BitsAndBytesConfig
-        # Reload with quantization
-        model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-            model_path,
-            trust_remote_code=True,
-            quantization_config=BitsAndBytesConfig(load_in_8bit=True),
-            torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
-            device_map="auto",
-        )
-        print("[LLM] 8-bit quantization applied successfully")
+        print("[LLM] Loading with 4-bit NF4 quantization (language model only)...")
+        model = _load_model(BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=dtype,
+            bnb_4bit_use_double_quant=True,
+            # Keep the vision tower and output head in half precision
+            llm_int8_skip_modules=["visual", "lm_head"],
+        ))
+        print("[LLM] 4-bit quantization applied successfully")
     except Exception as e:
-        print(f"[LLM] Quantization not available, using FP16: {e}")
-        # Model already loaded in FP16, continue
-        pass
+        print(f"[LLM] Quantization not available, using {dtype}: {e}")
+if model is None:
+    model = _load_model()
 
 if device == "cpu":
     model = model.to(device)
-
-print("[LLM] Model loaded successfully!")
+model.eval()
+
+# Vision-encoder cache: the same meal photo is usually sent several times in a row
+# (nutrition estimate, description, recipe), so the ViT output is reused per image.
+# 16 entries of ~64 visual tokens each is well under 10 MB of VRAM.
+VISION_CACHE_SIZE = 16
+_vision_cache = OrderedDict()
+_vision_cache_lock = Lock()
+
+def _cache_vision_encoder(visual):
+    encode = visual.forward
+
+    def forward(hidden_states, grid_thw=None, **kwargs):
+        key = (hashlib.sha1(hidden_states.detach().float().cpu().numpy().tobytes()).digest(),
+               tuple(grid_thw.flatten().tolist()) if torch.is_tensor(grid_thw) else None)
+        with _vision_cache_lock:
+            if key in _vision_cache:
+                _vision_cache.move_to_end(key)
+                return _vision_cache[key]
+        embeds = encode(hidden_states, grid_thw=grid_thw, **kwargs)
+        with _vision_cache_lock:
+            _vision_cache[key] = embeds
+            if len(_vision_cache) > VISION_CACHE_SIZE:
+                _vision_cache.popitem(last=False)
+        return embeds
+
+    visual.forward = forward
+
+_visual = getattr(model, "visual", None) or getattr(getattr(model, "model", None), "visual", None)
+if _visual is not None:
+    _cache_vision_encoder(_visual)
+else:
+    print("[LLM] Vision encoder not found, image features will not be cached")
+
+print(f"[LLM] Model loaded successfully! (attention: {attn_implementation})")
 
 
 # ==============================
@@ -79,37 +205,375 @@ Respond ONLY in **exactly** the following JSON format, with numeric values only:
 Do not include any other text or explanation.
 """
 
-def _generate_text(messages, max_tokens=150, temperature=0.7, top_p=0.9, images=None):
-    """Unified text generation handler"""
-    try:
-        text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        inputs = processor(
-            text=[text],
-            images=images if images else None,
-            return_tensors="pt",
-            padding=True
-        ).to(model.device)
-
-        outputs = model.generate(
-            **inputs,
-            do_sample=temperature > 0,
-            max_new_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p
+# Image decoding runs on its own pool (PIL releases the GIL while decoding/resizing),
+# bounded to the core count so a burst of uploads can't oversubscribe the CPU
+_IMG_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="img-decode")
+
+def _decode_image_sync(image_base64, size):
+    # BytesIO wraps the decoded bytes without copying; closing both here frees the compressed
+    # buffer and the decoder state as soon as the small image exists
+    with BytesIO(b64decode(image_base64)) as buf, Image.open(buf) as image:
+        # JPEG: let the decoder downscale (DCT scaling) so full-resolution pixels are never built
+        image.draft("RGB", size)
+        # draft() already yields RGB for JPEGs; convert() would only copy it
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+# Decoded uploads by content hash: the client sends the same photo to several endpoints
+# (nutrition, description, recipe). 64 x 224x224 RGB is under 10 MB.
+IMAGE_CACHE_SIZE = 64
+_image_cache = OrderedDict()
+_image_cache_lock = Lock()
+
+def _decode_image(image_base64, size=(224, 224)):
+    """Decode a base64 upload straight to the model input size, still as 8-bit RGB"""
+    key = (hashlib.blake2b(image_base64.encode("ascii"), digest_size=16).digest(), size)
+    with _image_cache_lock:
+        if key in _image_cache:
+            _image_cache.move_to_end(key)
+            return _image_cache[key]
+    image = _IMG_POOL.submit(_decode_image_sync, image_base64, size).result()
+    with _image_cache_lock:
+        _image_cache[key] = image
+        if len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+    return image
+
+def _to_device(inputs):
+    """Move processor output to the model device; on CUDA through pinned memory so the copy is async"""
+    if device != "cuda":
+        return inputs.to(model.device)
+    for key, value in inputs.items():
+        if torch.is_tensor(value):
+            if value.is_floating_point():
+                # pixel_values come out of the processor as FP32; the vision tower runs in `dtype`
+                # anyway, so cast on the host and copy half the bytes
+                value = value.to(dtype)
+            inputs[key] = value.pin_memory().to(model.device, non_blocking=True)
+    return inputs
+
+@lru_cache(maxsize=16)
+def _system_prefix(system_text):
+    """Rendered system turn and its token ids on the model device, built once per prompt"""
+    rendered = processor.apply_chat_template([{"role": "system", "content": system_text}], tokenize=False)
+    ids = processor.tokenizer(rendered, add_special_tokens=False, return_tensors="pt").input_ids
+    return rendered, ids.to(model.device)
+
+def _prepare_inputs(messages, images=None):
+    """Model inputs for a chat; a static system turn is reused from the token cache"""
+    text = processor.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    first = messages[0] if messages else None
+    if first and first["role"] == "system" and isinstance(first["content"], str):
+        prefix, prefix_ids = _system_prefix(first["content"])
+        # The system turn ends in <|im_end|>, so tokenizing the rest separately gives the same ids
+        if text.startswith(prefix):
+            inputs = _to_device(processor(
+                text=[text[len(prefix):]],
+                images=images if images else None,
+                return_tensors="pt",
+            ))
+            inputs["input_ids"] = torch.cat([prefix_ids, inputs["input_ids"]], dim=1)
+            inputs["attention_mask"] = torch.cat([torch.ones_like(prefix_ids), inputs["attention_mask"]], dim=1)
+            return inputs
+    return _to_device(processor(
+        text=[text],
+        images=images if images else None,
+        return_tensors="pt",
+    ))
+
+# Prefilled KV for static system turns: a text-only request starts decoding from a copy
+# instead of re-running prefill over the instructions. Switched off if this transformers
+# build rejects a pre-filled cache.
+_prefix_kv_enabled = True
+
+@lru_cache(maxsize=8)
+def _system_kv(system_text):
+    _, ids = _system_prefix(system_text)
+    with torch.inference_mode():
+        out = model(
+            input_ids=ids,
+            attention_mask=torch.ones_like(ids),
+            past_key_values=DynamicCache(),
+            cache_position=torch.arange(ids.shape[1], device=ids.device),
+            use_cache=True,
         )
+    return out.past_key_values
+
+def _prefilled_kv(messages, inputs):
+    """Copy of the cached system-turn KV when inputs start with that turn (text only), else None"""
+    first = messages[0] if messages else None
+    if not (_prefix_kv_enabled and first and first["role"] == "system" and isinstance(first["content"], str)):
+        return None
+    if "pixel_values" in inputs:
+        return None
+    _, ids = _system_prefix(first["content"])
+    n = ids.shape[1]
+    if inputs["input_ids"].shape[1] <= n or not torch.equal(inputs["input_ids"][:, :n], ids):
+        return None
+    with torch.inference_mode():
+        return copy.deepcopy(_system_kv(first["content"]))
+
+def _reset_rope_deltas(batch_size):
+    # Qwen2.5-VL keeps M-RoPE offsets between calls; with a pre-filled cache it skips
+    # recomputing them, so set the text-only value (no offset) explicitly
+    for module in (model, getattr(model, "model", None)):
+        if module is not None and "rope_deltas" in vars(module):
+            module.rope_deltas = torch.zeros(batch_size, 1, dtype=torch.long, device=model.device)
+
+# KV cache for generate(): "static" preallocates the KV buffers once per call instead of
+# growing them every decode step; set to None if this transformers/model combo rejects it
+_cache_impl = "static"
+
+def _generate(inputs, **kwargs):
+    """model.generate with KV caching and greedy/sampled single-beam decoding"""
+    global _cache_impl
+    kwargs.update(use_cache=True, num_beams=1)
+    # inference_mode is per-thread, so it is entered here rather than by the callers
+    with torch.inference_mode():
+        if "past_key_values" in kwargs:
+            _reset_rope_deltas(inputs["input_ids"].shape[0])
+            return model.generate(**inputs, **kwargs)
+        if _cache_impl:
+            try:
+                return model.generate(**inputs, cache_implementation=_cache_impl, **kwargs)
+            except ValueError as e:
+                print(f"[LLM] {_cache_impl} KV cache not supported, using the default cache: {e}")
+                _cache_impl = None
+        return model.generate(**inputs, **kwargs)
+
+def _clean_output(result):
+    """Flatten a decoded reply onto one line"""
+    return result.strip().replace("\n", " ")
 
-        result = processor.batch_decode(outputs, skip_special_tokens=True)[0]
+# ==============================
+# SAMPLING / STOPPING
+# ==============================
+def _sampling_kwargs(temperature, top_p):
+    """temperature <= 0 means greedy; temperature/top_p are only passed when sampling"""
+    if temperature > 0:
+        return {"do_sample": True, "temperature": temperature, "top_p": top_p}
+    return {"do_sample": False}
+
+class _JsonStop(StoppingCriteria):
+    """Stops each row once its first top-level {...} object has been closed"""
+    def __init__(self, batch_size):
+        self.depth = [0] * batch_size
+        self.opened = [False] * batch_size
+
+    def __call__(self, input_ids, scores, **kwargs):
+        tokens = processor.tokenizer.convert_ids_to_tokens(input_ids[:, -1].tolist())
+        done = []
+        for i, token in enumerate(tokens):
+            opens, closes = token.count("{"), token.count("}")
+            if opens:
+                self.opened[i] = True
+            self.depth[i] += opens - closes
+            done.append(self.opened[i] and self.depth[i] <= 0)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+@lru_cache(maxsize=1)
+def _json_open_ids():
+    """Vocabulary ids whose text starts with '{' (after byte-level BPE space/newline markers)"""
+    tokens = processor.tokenizer.convert_ids_to_tokens(list(range(len(processor.tokenizer))))
+    ids = [i for i, token in enumerate(tokens) if token and token.lstrip("ĠĊ").startswith("{")]
+    return torch.tensor(ids, device=model.device)
+
+class _JsonStart(LogitsProcessor):
+    """Forces the first generated token to open a JSON object, so the reply can't start with prose"""
+    def __init__(self, prompt_len):
+        self.prompt_len = prompt_len
+
+    def __call__(self, input_ids, scores):
+        if input_ids.shape[1] != self.prompt_len:
+            return scores
+        allowed = _json_open_ids()
+        masked = torch.full_like(scores, float("-inf"))
+        masked[:, allowed] = scores[:, allowed]
+        return masked
 
-        # Clean up response
-        for split_word in ["assistant", "user"]:
-            if split_word in result:
-                result = result.split(split_word)[-1].strip()
+# ==============================
+# MICRO-BATCHING
+# ==============================
+BATCH_MAX_SIZE = 8       # requests per generate() call
+BATCH_WINDOW_S = 0.01    # how long the first request waits for company
 
-        return result.strip().replace("\n", " ")
+# Settings marker for jobs that must run alone on the worker (streaming generation)
+_EXCLUSIVE = object()
+
+class _GenerateBatcher:
+    """
+    Single worker that runs concurrent (non-streaming) requests as one padded
+    generate() call. Only requests with the same generation settings share a batch.
+    It is the only thread that runs the model: generate() keeps per-call state on it
+    (static KV cache, rope_deltas), so streaming jobs are queued here too.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        Thread(target=self._run, daemon=True, name="generate-batcher").start()
+
+    def submit(self, messages, images, settings):
+        """settings is (max_tokens, temperature, top_p, stop_at_json); returns a Future for the cleaned text"""
+        future = Future()
+        self._queue.put((messages, images, settings, future))
+        return future
+
+    def run_exclusive(self, fn):
+        """Run fn() on the worker between batches; returns a Future for its result"""
+        future = Future()
+        self._queue.put((fn, None, _EXCLUSIVE, future))
+        return future
+
+    def _run(self):
+        deferred = []
+        while True:
+            first = deferred.pop(0) if deferred else self._queue.get()
+            if first[2] is _EXCLUSIVE:
+                self._run_exclusive(first)
+                continue
+            batch = [first]
+            deadline = time.monotonic() + BATCH_WINDOW_S
+            while len(batch) < BATCH_MAX_SIZE:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    break
+                (batch if item[2] == first[2] else deferred).append(item)
+            self._run_batch(batch)
+
+    def _run_exclusive(self, job):
+        fn, _, _, future = job
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            log.exception("[LLM] Model job failed")
+            future.set_exception(e)
+
+    def _run_batch(self, batch):
+        try:
+            if len(batch) == 1:
+                messages, images = batch[0][0], batch[0][1]
+                inputs = _prepare_inputs(messages, images)
+            else:
+                texts = [processor.apply_chat_template(m, tokenize=False, add_generation_prompt=True)
+                         for m, _, _, _ in batch]
+                # Images are matched to their <|image_pad|> placeholders in order across the batch
+                images = [img for _, imgs, _, _ in batch for img in (imgs or [])]
+                inputs = _to_device(processor(
+                    text=texts,
+                    images=images if images else None,
+                    padding=True,
+                    return_tensors="pt",
+                ))
+
+            max_tokens, temperature, top_p, stop_at_json = batch[0][2]
+            extra = {}
+            if stop_at_json:
+                # Reply is exactly one JSON object: open it on the first token, stop when it closes
+                extra["logits_processor"] = LogitsProcessorList([_JsonStart(inputs["input_ids"].shape[1])])
+                extra["stopping_criteria"] = StoppingCriteriaList([_JsonStop(len(batch))])
+            if len(batch) == 1:
+                outputs = self._generate_with_prefix(batch[0][0], inputs, max_tokens, temperature, top_p, extra)
+            else:
+                outputs = _generate(
+                    inputs,
+                    max_new_tokens=max_tokens,
+                    **_sampling_kwargs(temperature, top_p),
+                    **extra
+                )
+            # Prompts are left-padded to a common length, so the new tokens start at the same column
+            prompt_len = inputs["input_ids"].shape[1]
+            results = processor.tokenizer.batch_decode(outputs[:, prompt_len:], skip_special_tokens=True)
+            if len(batch) > 1:
+                print(f"[LLM] Generated a batch of {len(batch)} requests")
+            for (_, _, _, future), result in zip(batch, results):
+                future.set_result(_clean_output(result))
+        except Exception as e:
+            log.exception("[LLM] Batch generation failed")
+            for _, _, _, future in batch:
+                future.set_exception(e)
+
+    def _generate_with_prefix(self, messages, inputs, max_tokens, temperature, top_p, extra):
+        global _prefix_kv_enabled
+        kwargs = dict(max_new_tokens=max_tokens, **_sampling_kwargs(temperature, top_p), **extra)
+        try:
+            past = _prefilled_kv(messages, inputs)
+            if past is not None:
+                return _generate(inputs, past_key_values=past, **kwargs)
+        except (TypeError, ValueError) as e:
+            # Argument validation rejecting a pre-filled cache; anything else (OOM, sampling
+            # errors) propagates and fails only this batch
+            print(f"[LLM] Pre-filled system KV not supported, running full prefill: {e}")
+            _prefix_kv_enabled = False
+        return _generate(inputs, **kwargs)
+
+_batcher = _GenerateBatcher()
+
+def _generate_text(messages, max_tokens=150, temperature=0.7, top_p=0.9, images=None, stop_at_json=False):
+    """Unified text generation handler (batched with concurrent requests)"""
+    try:
+        settings = (max_tokens, temperature, top_p, stop_at_json)
+        return _batcher.submit(messages, images, settings).result()
     except Exception as e:
-        traceback.print_exc()
         return f"Error: {str(e)}"
 
+def _stream_text(messages, max_tokens=150, temperature=0.7, top_p=0.9, images=None):
+    """Like _generate_text, but yields text pieces as the model produces them"""
+    try:
+        inputs = _prepare_inputs(messages, images)
+
+        # skip_prompt drops the echoed prompt, so no assistant/user split is needed
+        streamer = TextIteratorStreamer(processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        def run():
+            try:
+                _generate(
+                    inputs,
+                    streamer=streamer,
+                    max_new_tokens=max_tokens,
+                    **_sampling_kwargs(temperature, top_p)
+                )
+            except Exception:
+                log.exception("[LLM] Streaming generation failed")
+                streamer.end()  # unblock the reader below
+
+        # Generation runs on the batcher worker; this thread only reads the streamer
+        _batcher.run_exclusive(run)
+        for piece in streamer:
+            if piece:
+                yield piece.replace("\n", " ")
+    except Exception as e:
+        log.exception("[LLM] Streaming setup failed")
+        yield f"Error: {str(e)}"
+
+def _extract_json(text):
+    """Last complete top-level {...} object in text (one pass, nesting-aware), or None"""
+    start = end = -1
+    depth = 0
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                candidate = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                start, end = candidate, i
+    return text[start:end + 1] if start != -1 else None
+
 # ==============================
 # CORE FUNCTIONS
 # ==============================
@@ -117,7 +581,7 @@ def estimate_nutrition_remote(image_base64, user_prompt=None, role_prompt=None):
     """Estimate nutrition from a base64-encoded image"""
     try:
         # Decode and prepare image
-        image = Image.open(BytesIO(base64.b64decode(image_base64))).convert("RGB").resize((224, 224))
+        image = _decode_image(image_base64)
 
         messages = [
             {"role": "system", "content": (role_prompt or DEFAULT_ROLE_PROMPT).strip()},
@@ -127,23 +591,22 @@ def estimate_nutrition_remote(image_base64, user_prompt=None, role_prompt=None):
             ]}
         ]
 
-        generated_text = _generate_text(messages, max_tokens=64, temperature=0.7, images=[image])
+        generated_text = _generate_text(messages, max_tokens=64, temperature=0, images=[image], stop_at_json=True)
 
         # Extract JSON
-        json_start = generated_text.rfind('{')
-        if json_start != -1:
-            json_str = generated_text[json_start:generated_text.find('}', json_start) + 1]
-            return json.loads(json_str)
+        json_str = _extract_json(generated_text)
+        if json_str is not None:
+            return json_loads(json_str)
         return {"error": "Could not find JSON in model output"}
 
     except Exception as e:
-        traceback.print_exc()
+        log.exception("[LLM] Nutrition estimation failed")
         return {"error": str(e)}
 
 def describe_food_remote(image_base64):
     """Generate a concise description of the food in the image"""
     try:
-        image = Image.open(BytesIO(base64.b64decode(image_base64))).convert("RGB").resize((224, 224))
+        image = _decode_image(image_base64)
         
         system_prompt = """
         You are a food description assistant.
@@ -166,9 +629,55 @@ def describe_food_remote(image_base64):
         return description.strip()
         
     except Exception as e:
-        traceback.print_exc()
+        log.exception("[LLM] Food description failed")
         return f"Error: {str(e)}"
 
+# Dynamic-tips prompts for every combination of issues, built once.
+# Mask bits: 1 = macros exceeded, 2 = high hunger, 4 = low energy.
+_TIPS_MACROS, _TIPS_HUNGER, _TIPS_ENERGY = 1, 2, 4
+
+def _build_tips_role_prompt(mask):
+    role_prompt = """
+    You are a friendly, professional nutrition assistant.
+    Always acknowledge the user's specific situation before giving advice.
+    Provide targeted, actionable advice that addresses ONLY the issues mentioned by the user.
+    Never use emojis.
+    """
+    
+    if mask & _TIPS_MACROS:
+        role_prompt += """
+    - For macro imbalances: suggest specific food types or adjustments for their next meal to rebalance intake.
+        """
+    
+    if mask & _TIPS_HUNGER:
+        role_prompt += """
+    - For high hunger: recommend foods that promote satiety (high protein, fiber, healthy fats).
+        """
+    
+    if mask & _TIPS_ENERGY:
+        role_prompt += """
+    - For low energy: suggest foods that provide sustained energy (complex carbs, balanced meals, hydration tips).
+        """
+    
+    role_prompt += """
+    Keep responses clear, practical, and under 5 sentences.
+    Focus exclusively on nutrition and diet advice.
+    """
+    return role_prompt.strip()
+
+def _build_tips_request(mask):
+    advice_needed = []
+    if mask & _TIPS_MACROS:
+        advice_needed.append("balance my macros for the next meal")
+    if mask & _TIPS_HUNGER:
+        advice_needed.append("feel more satiated")
+    if mask & _TIPS_ENERGY:
+        advice_needed.append("boost my energy levels")
+    return f"Please provide practical advice to help me {' and '.join(advice_needed)}."
+
+_TIPS_ROLE_PROMPTS = {mask: _build_tips_role_prompt(mask) for mask in range(8)}
+_TIPS_REQUESTS = {mask: _build_tips_request(mask) for mask in range(8)}
+
 def get_dynamic_tips_remote(meal_context):
     """
     Generate dynamic tips based on which thresholds were exceeded.
@@ -197,69 +706,43 @@ def get_dynamic_tips_remote(meal_context):
     if low_energy:
         issues.append(f"experiencing low energy (energy level: {energy_level}/5)")
     
+    mask = (_TIPS_MACROS if exceeded_macros else 0) | (_TIPS_HUNGER if high_hunger else 0) | (_TIPS_ENERGY if low_energy else 0)
     # Construct the prompt
-    user_prompt = f"After my {meal_type}, I'm experiencing the following: {'; '.join(issues)}. "
-    
-    # Add specific guidance request based on issues
-    advice_needed = []
-    if exceeded_macros:
-        advice_needed.append("balance my macros for the next meal")
-    if high_hunger:
-        advice_needed.append("feel more satiated")
-    if low_energy:
-        advice_needed.append("boost my energy levels")
-    
-    user_prompt += f"Please provide practical advice to help me {' and '.join(advice_needed)}."
-    
-    # Dynamic system prompt that adapts to the specific issues
-    role_prompt = """
-    You are a friendly, professional nutrition assistant.
-    Always acknowledge the user's specific situation before giving advice.
-    Provide targeted, actionable advice that addresses ONLY the issues mentioned by the user.
-    Never use emojis.
-    """
-    
-    if exceeded_macros:
-        role_prompt += """
-    - For macro imbalances: suggest specific food types or adjustments for their next meal to rebalance intake.
-        """
-    
-    if high_hunger:
-        role_prompt += """
-    - For high hunger: recommend foods that promote satiety (high protein, fiber, healthy fats).
-        """
-    
-    if low_energy:
-        role_prompt += """
-    - For low energy: suggest foods that provide sustained energy (complex carbs, balanced meals, hydration tips).
-        """
-    
-    role_prompt += """
-    Keep responses clear, practical, and under 5 sentences.
-    Focus exclusively on nutrition and diet advice.
-    """
+    user_prompt = f"After my {meal_type}, I'm experiencing the following: {'; '.join(issues)}. {_TIPS_REQUESTS[mask]}"
 
     messages = [
-        {"role": "system", "content": role_prompt.strip()},
+        {"role": "system", "content": _TIPS_ROLE_PROMPTS[mask]},
         {"role": "user", "content": user_prompt.strip()}
     ]
 
     return _generate_text(messages, max_tokens=150, temperature=0.8)
 
+CHAT_SYSTEM_PROMPT = """
+You are a helpful, friendly nutrition and fitness assistant. 
+Always start by acknowledging the user's question or comment.
+Focus your responses on nutrition, diet, fitness, and healthy eating.
+Keep responses concise (under 6 sentences), practical, and supportive.
+Never use emojis.
+If the user asks questions unrelated to nutrition, fitness, or their diet, politely explain that you can only provide advice in those areas and suggest seeking guidance from a relevant professional.
+""".strip()
+
+# Remaining-for-today range per macro (over by / still to go) treated as "on track"
+_CHAT_ON_TRACK = {
+    'Calories': (-500, 800),
+    'Proteins': (-20, 50),
+    'Carbs': (-30, 100),
+    'Fats': (-15, 30),
+}
+
 def get_chat_response_remote(user_message, daily_macros=None, daily_goals=None, meals_logged=None):
     """Generate a chat response with enhanced context"""
-    system_prompt = """
-    You are a helpful, friendly nutrition and fitness assistant. 
-    Always start by acknowledging the user's question or comment.
-    Focus your responses on nutrition, diet, fitness, and healthy eating.
-    Keep responses concise (under 6 sentences), practical, and supportive.
-    Never use emojis.
-    If the user asks questions unrelated to nutrition, fitness, or their diet, politely explain that you can only provide advice in those areas and suggest seeking guidance from a relevant professional.
-    """
+    # Per-user status goes in its own system turn after the fixed instructions,
+    # so the instructions stay a reusable prefix (see _prefilled_kv)
+    context_prompt = ""
 
     # Add consumed vs goal context if both are available
     if daily_macros and daily_goals:
-        system_prompt += f"""
+        context_prompt += f"""
 
         The user's nutritional status today:
         CONSUMED so far:
@@ -276,14 +759,9 @@ def get_chat_response_remote(user_message, daily_macros=None, daily_goals=None,
         """
         
         # Calculate remaining
-        remaining = {
-            'Calories': daily_goals.get('Calories', 0) - daily_macros.get('Calories', 0),
-            'Proteins': daily_goals.get('Proteins', 0) - daily_macros.get('Proteins', 0),
-            'Carbs': daily_goals.get('Carbs', 0) - daily_macros.get('Carbs', 0),
-            'Fats': daily_goals.get('Fats', 0) - daily_macros.get('Fats', 0)
-        }
+        remaining = {key: daily_goals.get(key, 0) - daily_macros.get(key, 0) for key in _CHAT_ON_TRACK}
         
-        system_prompt += f"""
+        context_prompt += f"""
         REMAINING for today:
         - Calories: {remaining['Calories']} kcal
         - Protein: {remaining['Proteins']}g
@@ -292,20 +770,17 @@ def get_chat_response_remote(user_message, daily_macros=None, daily_goals=None,
         """
         
         # Only suggest adjustments if it's highly relevant to the user's question or if they're significantly off track
-        has_significant_issue = (
-            remaining['Calories'] < -500 or remaining['Calories'] > 800 or
-            remaining['Proteins'] < -20 or remaining['Proteins'] > 50 or
-            remaining['Carbs'] < -30 or remaining['Carbs'] > 100 or
-            remaining['Fats'] < -15 or remaining['Fats'] > 30
+        has_significant_issue = any(
+            not low <= remaining[key] <= high for key, (low, high) in _CHAT_ON_TRACK.items()
         )
         
         if has_significant_issue:
-            system_prompt += """
+            context_prompt += """
         
         NOTE: Only mention the user's progress toward their goals if it's directly relevant to their question or if they have a significant macro imbalance that needs addressing.
             """
         else:
-            system_prompt += """
+            context_prompt += """
         
         NOTE: The user's intake is reasonably on track. Only mention their macro status if they specifically ask about it. Focus on answering their actual question.
             """
@@ -313,21 +788,21 @@ def get_chat_response_remote(user_message, daily_macros=None, daily_goals=None,
     # Add meals logged context
     if meals_logged:
         meals_str = ", ".join(meals_logged)
-        system_prompt += f"""
+        context_prompt += f"""
 
         Meals logged today: {meals_str}
         Only mention which meals they've had if relevant to their question (e.g., "What should I eat for lunch?" when they haven't had lunch yet).
         """
 
-    messages = [
-        {"role": "system", "content": system_prompt.strip()},
-        {"role": "user", "content": user_message.strip()}
-    ]
+    messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+    if context_prompt:
+        messages.append({"role": "system", "content": context_prompt.strip()})
+    messages.append({"role": "user", "content": user_message.strip()})
     print(messages)
 
     return _generate_text(messages, max_tokens=200, temperature=0.7)
 
-def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_only"):
+def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_only", stream=False):
     """
     Generate a detailed recipe with measurements.
     
@@ -335,9 +810,10 @@ def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_onl
         recipe_prompt: Text description of desired recipe
         image_base64: Base64 encoded image of ingredients
         mode: "text_only", "image_only", or "text_and_image"
+        stream: Return a generator of text pieces instead of the finished string
     
     Returns:
-        Detailed recipe as a string
+        Detailed recipe as a string (error messages are always plain strings)
     """
     try:
         system_prompt = """
@@ -378,7 +854,7 @@ def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_onl
             if not image_base64:
                 return "Error: No image provided"
             
-            image = Image.open(BytesIO(base64.b64decode(image_base64))).convert("RGB").resize((224, 224))
+            image = _decode_image(image_base64)
             images = [image]
             
             user_content = [
@@ -401,7 +877,7 @@ def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_onl
             if not any(keyword in recipe_prompt.lower() for keyword in recipe_keywords):
                 return "This page is for recipe generation only. Your prompt and image don't appear to be recipe-related. Please provide a recipe-related request such as 'Generate an Italian recipe using these ingredients'."
             
-            image = Image.open(BytesIO(base64.b64decode(image_base64))).convert("RGB").resize((224, 224))
+            image = _decode_image(image_base64)
             images = [image]
             
             user_content = [
@@ -415,11 +891,13 @@ def generate_recipe_remote(recipe_prompt=None, image_base64=None, mode="text_onl
             ]
         
         # Generate with double the normal length for detailed recipes
+        if stream:
+            return _stream_text(messages, max_tokens=400, temperature=0.7, images=images)
         recipe = _generate_text(messages, max_tokens=400, temperature=0.7, images=images)
         return recipe.strip()
         
     except Exception as e:
-        traceback.print_exc()
+        log.exception("[Recipe] Recipe generation failed")
         return f"Error generating recipe: {str(e)}"
 
 # ==============================
@@ -441,6 +919,15 @@ def api_estimate_nutrition():
     )
     return jsonify(result)
 
+@app.route("/analyze", methods=["POST"])
+def api_analyze():
+    """Nutrition estimate and description for one upload (decoded and ViT-encoded once)"""
+    data = request.get_json()
+    image_base64 = data.get("image_base64")
+    nutrition = estimate_nutrition_remote(image_base64, data.get("user_prompt"), data.get("role_prompt"))
+    description = describe_food_remote(image_base64)
+    return jsonify({"nutrition": nutrition, "description": description})
+
 @app.route("/describe_food", methods=["POST"])
 def api_describe_food():
     """Generate a description of the food in an image"""
@@ -481,23 +968,53 @@ def api_generate_recipe():
     )
     return jsonify({"recipe": result})
 
+@app.route("/generate_recipe_stream", methods=["POST"])
+def api_generate_recipe_stream():
+    """Same as /generate_recipe, but sends the recipe as plain text while it is generated"""
+    data = request.get_json()
+    result = generate_recipe_remote(
+        recipe_prompt=data.get("recipe_prompt"),
+        image_base64=data.get("image_base64"),
+        mode=data.get("mode", "text_only"),
+        stream=True
+    )
+    return Response(result, mimetype="text/plain; charset=utf-8")
+
 # ==============================
 # START SERVER
 # ==============================
-# insert ngrok auth token here
-ngrok.set_auth_token('#YOUR_NGROK_AUTH_TOKEN HERE#')
-public_url = ngrok.connect(5000)
-print("\n" + "="*60)
-print("LLM Server is running!")
-print("="*60)
-print(f"Public URL: {public_url}")
-print("="*60)
-print("\nEndpoints available:")
-print(f"  - {public_url}/health (GET)")
-print(f"  - {public_url}/estimate_nutrition (POST)")
-print(f"  - {public_url}/dynamic_tips (POST)")
-print(f"  - {public_url}/chat (POST)")
-print("\nIMPORTANT: Copy the public URL and paste it in your local chatbot.py file!")
-print("="*60 + "\n")
-
-app.run(port=5000)
\ No newline at end of file
+# Request threads only decode and queue work; the batcher thread alone drives the GPU,
+# so several of them can prepare images while a batch is generating
+SERVER_THREADS = 8
+
+def _start_public_url():
+    """Open the ngrok tunnel to the local server and print the endpoints"""
+    # Only needed when run as the server, so pyngrok isn't imported otherwise
+    from pyngrok import ngrok
+    # insert ngrok auth token here
+    ngrok.set_auth_token('#YOUR_NGROK_AUTH_TOKEN HERE#')
+    public_url = ngrok.connect(5000)
+    print("\n" + "="*60)
+    print("LLM Server is running!")
+    print("="*60)
+    print(f"Public URL: {public_url}")
+    print("="*60)
+    print("\nEndpoints available:")
+    print(f"  - {public_url}/health (GET)")
+    print(f"  - {public_url}/estimate_nutrition (POST)")
+    print(f"  - {public_url}/dynamic_tips (POST)")
+    print(f"  - {public_url}/chat (POST)")
+    print(f"  - {public_url}/generate_recipe_stream (POST)")
+    print("\nIMPORTANT: Copy the public URL and paste it in your local chatbot.py file!")
+    print("="*60 + "\n")
+    return public_url
+
+if __name__ == "__main__":
+    _start_public_url()
+
+    try:
+        from waitress import serve
+        serve(app, host="127.0.0.1", port=5000, threads=SERVER_THREADS)
+    except ImportError:
+        print("[LLM] waitress not installed, using the Flask development server")
+        app.run(port=5000, threaded=True)
\ No newline at end of file
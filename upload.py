@@ -1,6 +1,11 @@
 import requests
 import datetime
 import json
+import time
+import atexit
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # ==============================
 # CONFIG
@@ -8,17 +13,37 @@ import json
 # insert your api key, project id and firestore url here
 API_KEY = "#API_KEY HERE#" 
 PROJECT_ID = "#PROJECT_ID HERE#"
-BASE_URL = f"https://firestore.googleapis.com/v1/projects/{PROJECT_ID}/databases/(default)/documents"
+DOC_ROOT = f"projects/{PROJECT_ID}/databases/(default)/documents"
+BASE_URL = f"https://firestore.googleapis.com/v1/{DOC_ROOT}"
+
+# Shared keep-alive session for reads and writes: one TLS handshake reused across
+# requests, with enough pooled connections for a week of parallel day reads
+_READ_POOL_SIZE = 7
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_READ_POOL_SIZE))
+_session.headers["Content-Type"] = "application/json"
+atexit.register(_session.close)
+
+# Writes: attempts and backoff for transient failures (contention, rate limits, 5xx, dropped connections)
+_WRITE_ATTEMPTS = 3
+_WRITE_BACKOFF = 0.5
+_WRITE_TIMEOUT = 15
+_RETRY_STATUSES = (409, 429, 500, 502, 503, 504)
+_BATCH_WRITE_LIMIT = 500  # Firestore's cap on writes per batchWrite request
+
+log = logging.getLogger(__name__)
 
 # ==============================
 # FIREBASE REST (MOCK SINGLETON)
 # ==============================
 _db_instance = True  # just to preserve your old function structure
+_initialized = False
 
 def init_firebase():
-    """Mock Firebase init (REST version doesn't need actual initialization)."""
-    global _db_instance
-    if _db_instance:
+    """Mock Firebase init (REST version doesn't need actual initialization). Idempotent."""
+    global _initialized
+    if not _initialized:
+        _initialized = True
         print("[Firebase REST] Initialized successfully (no SDK required)")
     return _db_instance
 
@@ -48,9 +73,26 @@ def _make_meal_fields(nutrition_data):
     return {"mapValue": {"fields": fields}}
 
 
+@lru_cache(maxsize=256)
+def _meal_logs_url(user_id):
+    """mealLogs collection URL for a user, built once per user"""
+    return f"{BASE_URL}/users/{user_id}/mealLogs"
+
+
+@lru_cache(maxsize=8)
+def _date_str(ordinal):
+    """YYYY-MM-DD for a date ordinal"""
+    return datetime.date.fromordinal(ordinal).strftime("%Y-%m-%d")
+
+
+def _today_str():
+    """Today's date as YYYY-MM-DD (formatted once per day)"""
+    return _date_str(datetime.date.today().toordinal())
+
+
 def _get_doc_url(user_id, date_str):
     """Get Firestore REST document URL"""
-    return f"{BASE_URL}/users/{user_id}/mealLogs/{date_str}?key={API_KEY}"
+    return f"{_meal_logs_url(user_id)}/{date_str}?key={API_KEY}"
 
 
 def _get_user_url(user_id):
@@ -84,11 +126,28 @@ def _fields_to_dict(fields):
     return out
 
 
+def _write(url, payload, method="patch"):
+    """Send a Firestore write (document PATCH or batchWrite POST), retrying transient failures with exponential backoff."""
+    body = json.dumps(payload)
+    for attempt in range(_WRITE_ATTEMPTS):
+        last = attempt == _WRITE_ATTEMPTS - 1
+        try:
+            response = _session.request(method, url, data=body, timeout=_WRITE_TIMEOUT)
+            if response.status_code not in _RETRY_STATUSES or last:
+                return response
+            print(f"[Firebase REST] Write got {response.status_code}, retrying...")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last:
+                raise
+            print(f"[Firebase REST] Write failed ({e}), retrying...")
+        time.sleep(_WRITE_BACKOFF * (2 ** attempt))
+
+
 def get_user_doc(user_id):
     """Fetch a user document via REST and return plain dict or None."""
     try:
         url = _get_user_url(user_id)
-        resp = requests.get(url)
+        resp = _session.get(url, timeout=10)
         if resp.status_code != 200:
             print(f"[Firebase REST DEBUG] get_user_doc {resp.status_code}: {resp.text}")
             return None
@@ -104,7 +163,7 @@ def get_meal_doc(user_id, date_str):
     """Fetch a mealLogs document for a given date via REST and return plain dict or None."""
     try:
         url = _get_doc_url(user_id, date_str)
-        resp = requests.get(url)
+        resp = _session.get(url, timeout=10)
         if resp.status_code != 200:
             print(f"[Firebase REST DEBUG] get_meal_doc {resp.status_code}: {resp.text}")
             return None
@@ -116,6 +175,12 @@ def get_meal_doc(user_id, date_str):
         return None
 
 
+def get_meal_docs(user_id, dates):
+    """Fetch several mealLogs documents concurrently; results follow the order of dates."""
+    with ThreadPoolExecutor(max_workers=min(len(dates), _READ_POOL_SIZE) or 1) as pool:
+        return list(pool.map(lambda d: get_meal_doc(user_id, d), dates))
+
+
 # ==============================
 # UPLOAD SINGLE MEAL (REST)
 # ==============================
@@ -124,10 +189,9 @@ def upload_meal(user_id, meal_type, nutrition_data, date_str=None):
         init_firebase()
 
         if date_str is None:
-            date_str = datetime.date.today().strftime("%Y-%m-%d")
+            date_str = _today_str()
 
         url = _get_doc_url(user_id, date_str)
-        headers = {"Content-Type": "application/json"}
 
         # Prepare Firestore REST-compatible payload
         fields = {
@@ -143,7 +207,7 @@ def upload_meal(user_id, meal_type, nutrition_data, date_str=None):
         patch_url = url + mask_params
         print(f"[Firebase REST DEBUG] PATCH URL: {patch_url}")
         print(f"[Firebase REST DEBUG] Payload: {json.dumps(payload)}")
-        response = requests.patch(patch_url, headers=headers, data=json.dumps(payload))
+        response = _write(patch_url, payload)
 
         if response.status_code not in (200, 201):
             print(f"[Firebase REST ERROR] {response.status_code}: {response.text}")
@@ -155,8 +219,7 @@ def upload_meal(user_id, meal_type, nutrition_data, date_str=None):
 
     except Exception as e:
         print(f"[Firebase REST ERROR] Failed to upload: {e}")
-        import traceback
-        traceback.print_exc()
+        log.debug("Firestore write traceback", exc_info=True)
         return False
 
 
@@ -179,7 +242,6 @@ def update_macro_goals(user_id, goals_update):
         init_firebase()
         
         url = _get_user_url(user_id)
-        headers = {"Content-Type": "application/json"}
         
         # Build the nested field structure for daily_macros_goal
         macro_fields = {}
@@ -213,7 +275,7 @@ def update_macro_goals(user_id, goals_update):
         print(f"[Firebase REST DEBUG] PATCH URL (macro goals): {patch_url}")
         print(f"[Firebase REST DEBUG] Payload: {json.dumps(payload)}")
         
-        response = requests.patch(patch_url, headers=headers, data=json.dumps(payload))
+        response = _write(patch_url, payload)
         
         if response.status_code not in (200, 201):
             print(f"[Firebase REST ERROR] {response.status_code}: {response.text}")
@@ -225,34 +287,36 @@ def update_macro_goals(user_id, goals_update):
         
     except Exception as e:
         print(f"[Firebase REST ERROR] Failed to update macro goals: {e}")
-        import traceback
-        traceback.print_exc()
+        log.debug("Firestore write traceback", exc_info=True)
         return False
 
 # ==============================
 # UPLOAD FULL DAY (REST)
 # ==============================
+_DAY_MEALS = ('breakfast', 'lunch', 'dinner', 'supper', 'snacks')
+
+
+def _make_day_fields(**meals):
+    """Firestore fields for every meal that has data, plus last_updated"""
+    fields = {}
+
+    # Build all available meals
+    for meal_type in _DAY_MEALS:
+        meal_data = meals.get(meal_type)
+        if meal_data:
+            fields[meal_type] = _make_meal_fields(meal_data)
+
+    fields["last_updated"] = {"timestampValue": datetime.datetime.utcnow().isoformat() + "Z"}
+    return fields
+
+
 def upload_full_day(user_id, date_str, breakfast=None, lunch=None, dinner=None, supper=None, snacks=None):
     try:
         init_firebase()
 
         url = _get_doc_url(user_id, date_str)
-        headers = {"Content-Type": "application/json"}
-
-        fields = {}
 
-        # Build all available meals
-        for meal_type, meal_data in [
-            ('breakfast', breakfast),
-            ('lunch', lunch),
-            ('dinner', dinner),
-            ('supper', supper),
-            ('snacks', snacks)
-        ]:
-            if meal_data:
-                fields[meal_type] = _make_meal_fields(meal_data)
-
-        fields["last_updated"] = {"timestampValue": datetime.datetime.utcnow().isoformat() + "Z"}
+        fields = _make_day_fields(breakfast=breakfast, lunch=lunch, dinner=dinner, supper=supper, snacks=snacks)
 
         payload = {"fields": fields}
 
@@ -264,7 +328,7 @@ def upload_full_day(user_id, date_str, breakfast=None, lunch=None, dinner=None,
         patch_url = url + mask_query
         print(f"[Firebase REST DEBUG] PATCH URL (full day): {patch_url}")
         print(f"[Firebase REST DEBUG] Payload (full day): {json.dumps(payload)}")
-        response = requests.patch(patch_url, headers=headers, data=json.dumps(payload))
+        response = _write(patch_url, payload)
 
         if response.status_code not in (200, 201):
             print(f"[Firebase REST ERROR] {response.status_code}: {response.text}")
@@ -275,8 +339,54 @@ def upload_full_day(user_id, date_str, breakfast=None, lunch=None, dinner=None,
 
     except Exception as e:
         print(f"[Firebase REST ERROR] Failed to upload full day: {e}")
-        import traceback
-        traceback.print_exc()
+        log.debug("Firestore write traceback", exc_info=True)
+        return False
+
+
+def upload_full_days(user_id, days):
+    """
+    Upload many days at once (e.g. a history import) with batchWrite,
+    up to 500 documents per request instead of one PATCH per day.
+    
+    Args:
+        user_id: The user's ID
+        days: Dict of date_str -> {meal_type: nutrition_data}
+    
+    Returns:
+        bool: True if every day was written, False otherwise
+    """
+    try:
+        init_firebase()
+
+        writes = []
+        for date_str, meals in days.items():
+            fields = _make_day_fields(**meals)
+            writes.append({
+                "update": {"name": f"{DOC_ROOT}/users/{user_id}/mealLogs/{date_str}", "fields": fields},
+                # Merge like upload_full_day: meals not in this upload are left alone
+                "updateMask": {"fieldPaths": list(fields)},
+            })
+
+        ok = True
+        for start in range(0, len(writes), _BATCH_WRITE_LIMIT):
+            batch = writes[start:start + _BATCH_WRITE_LIMIT]
+            response = _write(f"{BASE_URL}:batchWrite?key={API_KEY}", {"writes": batch}, method="post")
+            if response.status_code != 200:
+                print(f"[Firebase REST ERROR] {response.status_code}: {response.text}")
+                ok = False
+                continue
+            # batchWrite is not atomic: each write reports its own status (code 0 = OK)
+            failed = [s for s in response.json().get("status", []) if s.get("code", 0) != 0]
+            if failed:
+                print(f"[Firebase REST ERROR] {len(failed)} of {len(batch)} day writes failed: {failed[0]}")
+                ok = False
+
+        print(f"[Firebase REST] Uploaded {len(writes)} days for {user_id}" + ("" if ok else " (with errors)"))
+        return ok
+
+    except Exception as e:
+        print(f"[Firebase REST ERROR] Failed to upload days: {e}")
+        log.debug("Firestore write traceback", exc_info=True)
         return False
 
 